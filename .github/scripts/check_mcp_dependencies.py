@@ -4,10 +4,14 @@ MCP依赖检查脚本
 检查插件的MCP服务器配置和依赖
 """
 
+import argparse
 import json
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Optional, Set, Tuple, Any
+
+from ci_cache import ResultCache, changed_plugins, rules_version
+from repo_scanner import scan_repository, select_plugins
 
 
 def load_mcp_config(mcp_config_path: Path) -> Tuple[bool, Any]:
@@ -166,19 +170,36 @@ def validate_plugin_mcp_dependencies(plugin_path: Path) -> Dict:
     return result
 
 
-def validate_all_mcp_dependencies(plugins_dir: Path) -> List[Dict]:
-    """验证所有插件的MCP依赖"""
-    if not plugins_dir.exists():
+def validate_all_mcp_dependencies(
+    repo: Dict, cache: Optional[ResultCache] = None, only: Optional[Set[str]] = None
+) -> List[Dict]:
+    """
+    验证所有插件的MCP依赖
+
+    Args:
+        repo: scan_repository() 的结果
+        cache: 按 tools/.mcp.json 内容缓存的结果，None 表示不使用
+        only: 只检查这些插件（--changed-since），None 表示全部
+    """
+    if not repo["plugins_dir"].exists():
         print("❌ plugins 目录不存在")
         return []
 
     results = []
-    plugin_dirs = [d for d in plugins_dir.iterdir() if d.is_dir()]
-
-    print(f"🔍 检查 {len(plugin_dirs)} 个插件的MCP依赖...")
-
-    for plugin_dir in plugin_dirs:
-        result = validate_plugin_mcp_dependencies(plugin_dir)
+    plugins = select_plugins(repo, only)
+    if only is not None:
+        print(f"⏭️  跳过 {len(repo['plugins']) - len(plugins)} 个未改动的插件")
+
+    print(f"🔍 检查 {len(plugins)} 个插件的MCP依赖...")
+
+    for plugin in plugins:
+        mcp_config_path = plugin["mcp_config_path"]
+        result = cache.get(mcp_config_path) if cache and "tools" in plugin["dirs"] else None
+        if result is None:
+            result = validate_plugin_mcp_dependencies(plugin["path"])
+            # 只缓存成功加载的配置，加载失败时每次都重新输出错误信息
+            if cache and result["has_mcp_config"]:
+                cache.put(mcp_config_path, result)
         results.append(result)
 
         # 显示简短结果
@@ -241,16 +262,32 @@ def generate_mcp_installation_guide(results: List[Dict]) -> str:
 
 
 def main():
-    plugins_dir = Path("plugins")
+    parser = argparse.ArgumentParser(description="检查插件的MCP服务器配置和依赖")
+    parser.add_argument("--changed-since", metavar="GIT_REF", help="只检查相对该 git 引用有改动的插件")
+    parser.add_argument("--no-cache", action="store_true", help="不使用检查结果缓存")
+    args = parser.parse_args()
+
+    repo = scan_repository()
 
-    if not plugins_dir.exists():
+    if not repo["plugins_dir"].exists():
         print("❌ plugins 目录不存在")
         return False
 
     print("�� 开始MCP依赖检查...")
 
+    cache = ResultCache("check_mcp_dependencies", rules_version(Path(__file__)), enabled=not args.no_cache)
+    only = changed_plugins(args.changed_since) if args.changed_since else None
+
     # 验证所有插件的MCP依赖
-    results = validate_all_mcp_dependencies(plugins_dir)
+    results = validate_all_mcp_dependencies(repo, cache=cache, only=only)
+
+    if cache.enabled:
+        cache.save()
+        print(cache.summary())
+
+    if only is not None and not results:
+        print(f"✅ 自 {args.changed_since} 以来没有插件改动")
+        return True
 
     if not results:
         print("❌ 没有找到插件进行验证")
@@ -289,18 +326,19 @@ def main():
         for warning in all_warnings:
             print(f"  {warning}")
 
-    # 生成安装指南
-    print(f"\n📋 MCP服务器安装指南:")
-    installation_guide = generate_mcp_installation_guide(results)
-    print(installation_guide)
-
-    # 保存安装指南到文件
-    try:
-        with open("MCP_INSTALLATION_GUIDE.md", "w", encoding="utf-8") as f:
-            f.write(installation_guide)
-        print("💾 安装指南已保存到 MCP_INSTALLATION_GUIDE.md")
-    except Exception as e:
-        print(f"⚠️  无法保存安装指南: {e}")
+    # 生成安装指南（只检查部分插件时指南不完整，不生成）
+    if only is None:
+        print(f"\n📋 MCP服务器安装指南:")
+        installation_guide = generate_mcp_installation_guide(results)
+        print(installation_guide)
+
+        # 保存安装指南到文件
+        try:
+            with open("MCP_INSTALLATION_GUIDE.md", "w", encoding="utf-8") as f:
+                f.write(installation_guide)
+            print("💾 安装指南已保存到 MCP_INSTALLATION_GUIDE.md")
+        except Exception as e:
+            print(f"⚠️  无法保存安装指南: {e}")
 
     overall_success = total_issues == 0
 
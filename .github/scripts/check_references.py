@@ -4,55 +4,70 @@
 验证 marketplace.json 中引用的所有文件是否存在
 """
 
-import json
+import argparse
 import sys
 from pathlib import Path
+from typing import Dict, Optional, Set
 
+from ci_cache import changed_plugins
+from repo_scanner import marketplace_plugins, scan_plugin, scan_repository
 
-def check_references():
-    """检查 marketplace.json 中的插件引用"""
-    marketplace_path = Path(".claude-plugin/marketplace.json")
-    if not marketplace_path.exists():
+
+def check_references(repo: Optional[Dict] = None, only: Optional[Set[str]] = None):
+    """
+    检查 marketplace.json 中的插件引用
+
+    Args:
+        repo: scan_repository() 的结果，None 时重新扫描
+        only: 只检查这些插件（--changed-since），None 表示全部
+    """
+    if repo is None:
+        repo = scan_repository()
+    if not repo["marketplace_path"].exists():
         print("❌ marketplace.json not found")
         return False
 
-    try:
-        with open(marketplace_path, "r", encoding="utf-8") as f:
-            marketplace = json.load(f)
-    except json.JSONDecodeError as e:
-        print(f"❌ marketplace.json 格式错误: {e}")
+    if repo["marketplace_error"]:
+        print(f"❌ marketplace.json 格式错误: {repo['marketplace_error']}")
         return False
 
     all_valid = True
-    base_path = Path(".")
-    total_plugins = len(marketplace.get("plugins", []))
+    plugins = marketplace_plugins(repo)
+    if only is not None:
+        # only 是 plugins/ 下的目录名，marketplace 中的插件名不一定与目录名相同
+        plugins = [p for p in plugins if Path(p.get("source", "").lstrip("./")).name in only]
+        print(f"⏭️  跳过 {len(marketplace_plugins(repo)) - len(plugins)} 个未改动的插件")
+    total_plugins = len(plugins)
 
     print(f"🔍 检查 {total_plugins} 个插件的引用...")
 
-    for i, plugin in enumerate(marketplace.get("plugins", []), 1):
+    for i, plugin in enumerate(plugins, 1):
         plugin_name = plugin.get("name", "unknown")
         plugin_source = plugin.get("source", "").lstrip("./")
-        plugin_path = base_path / plugin_source
+        plugin_path = repo["root"] / plugin_source
+        scanned = repo["plugins"].get(plugin_path.name) if plugin_path.parent == repo["plugins_dir"] else None
+        if scanned is None and plugin_path.is_dir():
+            # source 指向 plugins/ 之外的目录
+            scanned = scan_plugin(plugin_path)
 
         print(f"\n📦 [{i}/{total_plugins}] 检查插件: {plugin_name}")
 
         # 检查插件源目录是否存在
-        if plugin_path.exists():
+        if scanned or plugin_path.exists():
             print(f"  ✅ 插件目录存在: {plugin_source}")
+            subdirs = scanned["dirs"] if scanned else set()
 
             # 检查必需的子目录
             required_dirs = ["agents", "skills", "commands"]
             for required_dir in required_dirs:
-                dir_path = plugin_path / required_dir
-                if dir_path.exists() and dir_path.is_dir():
+                if required_dir in subdirs:
                     print(f"  ✅ {required_dir}/ 存在")
                 else:
                     print(f"  ❌ {required_dir}/ 不存在或不是目录")
                     all_valid = False
 
             # 检查 README.md
-            readme_path = plugin_path / "README.md"
-            if readme_path.exists():
+            if scanned and scanned["has_readme"]:
                 print(f"  ✅ README.md 存在")
             else:
                 print(f"  ⚠️  README.md 不存在")
@@ -70,30 +85,27 @@ def check_references():
     return all_valid
 
 
-def check_plugin_consistency():
+def check_plugin_consistency(repo: Optional[Dict] = None):
     """检查插件配置的一致性"""
-    marketplace_path = Path(".claude-plugin/marketplace.json")
-    plugins_dir = Path("plugins")
+    if repo is None:
+        repo = scan_repository()
 
-    if not marketplace_path.exists() or not plugins_dir.exists():
+    if not repo["marketplace_path"].exists() or not repo["plugins_dir"].exists():
         return True
 
-    try:
-        with open(marketplace_path, "r", encoding="utf-8") as f:
-            marketplace = json.load(f)
-    except json.JSONDecodeError:
+    if repo["marketplace_error"]:
         return False
 
-    marketplace_plugins = {p.get("name") for p in marketplace.get("plugins", [])}
-    existing_plugins = {p.name for p in plugins_dir.iterdir() if p.is_dir()}
+    marketplace_names = {p.get("name") for p in marketplace_plugins(repo)}
+    existing_plugins = set(repo["plugins"])
 
     # 检查是否所有 marketplace 中的插件都存在
-    missing_plugins = marketplace_plugins - existing_plugins
+    missing_plugins = marketplace_names - existing_plugins
     if missing_plugins:
         print(f"⚠️  Marketplace 中定义但目录不存在的插件: {', '.join(missing_plugins)}")
 
     # 检查是否有未在 marketplace 中注册的插件
-    unregistered_plugins = existing_plugins - marketplace_plugins
+    unregistered_plugins = existing_plugins - marketplace_names
     if unregistered_plugins:
         print(
             f"ℹ️  存在但未在 marketplace 中注册的插件: {', '.join(unregistered_plugins)}"
@@ -103,14 +115,20 @@ def check_plugin_consistency():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="验证 marketplace.json 中引用的所有文件是否存在")
+    parser.add_argument("--changed-since", metavar="GIT_REF", help="只检查相对该 git 引用有改动的插件")
+    args = parser.parse_args()
+
     print("🔍 开始文件引用检查...")
 
-    # 检查文件引用
-    references_ok = check_references()
+    # 检查文件引用（只是目录存在性检查，不需要结果缓存）
+    repo = scan_repository()
+    only = changed_plugins(args.changed_since) if args.changed_since else None
+    references_ok = check_references(repo, only)
 
     # 检查插件一致性
     print("\n🔍 检查插件配置一致性...")
-    consistency_ok = check_plugin_consistency()
+    consistency_ok = check_plugin_consistency(repo)
 
     success = references_ok and consistency_ok
 
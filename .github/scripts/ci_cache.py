@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+CI 验证结果缓存
+按文件内容哈希和规则集版本缓存每个文件的验证结果，未改变的文件直接复用；
+changed_plugins() 根据 git 差异找出受影响的插件，供 --changed-since <git-ref> 使用
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Optional, Set
+
+# 缓存目录（CI 中通过 actions/cache 在多次运行之间保留）
+CACHE_DIR = Path(os.environ.get("CI_CACHE_DIR", ".ci-cache"))
+
+# 这些文件变化时所有插件都视为受影响
+GLOBAL_PATHS = (".claude-plugin/", ".github/scripts/")
+
+
+def file_digest(path: Path) -> str:
+    """文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rules_version(*sources: Path) -> str:
+    """规则集版本: 验证脚本源码的哈希，规则改动后旧结果自动失效"""
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(Path(source).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    单个验证脚本的结果缓存（.ci-cache/<namespace>.json）
+
+    先比较 (mtime, size)，不一致时再比较内容哈希，因此 CI 重新检出导致 mtime 变化也能命中。
+
+    用法:
+        cache = ResultCache("validate_content", rules_version(Path(__file__)))
+        result = cache.get(path)
+        if result is None:
+            result = validate(path)
+            cache.put(path, result)
+        cache.save()
+    """
+
+    def __init__(self, namespace: str, version: str, enabled: bool = True):
+        self.path = CACHE_DIR / f"{namespace}.json"
+        self.version = version
+        self.enabled = enabled
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+
+        if enabled and self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == version:
+                    self.entries = data.get("entries", {})
+            except (OSError, json.JSONDecodeError):
+                self.entries = {}
+
+    def get(self, path: Path) -> Optional[Any]:
+        """查询文件的缓存结果，未命中（或文件不存在）返回 None"""
+        if not self.enabled:
+            return None
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+
+        key = str(path)
+        entry = self.entries.get(key)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            self.hits += 1
+            return entry["result"]
+
+        digest = file_digest(path)
+        if entry and entry["sha256"] == digest:
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            self.hits += 1
+            return entry["result"]
+
+        self.misses += 1
+        self._pending[key] = (digest, stat)
+        return None
+
+    def put(self, path: Path, result: Any):
+        """记录文件的验证结果（结果必须可以 JSON 序列化）"""
+        if not self.enabled:
+            return
+        key = str(path)
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            try:
+                pending = (file_digest(path), path.stat())
+            except OSError:
+                return
+        digest, stat = pending
+        self.entries[key] = {
+            "sha256": digest,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "result": result,
+        }
+
+    def save(self):
+        """原子写回缓存文件"""
+        if not self.enabled:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "entries": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        return f"♻️  缓存命中 {self.hits}/{total} 个文件" if total else "♻️  没有需要查询缓存的文件"
+
+
+def changed_plugins(ref: str) -> Optional[Set[str]]:
+    """
+    找出相对 git-ref 有改动的插件（包括工作区未提交和未跟踪的文件）
+
+    Args:
+        ref: git 引用，如 origin/main、HEAD~1
+
+    Returns:
+        受影响的插件名集合；marketplace.json 或验证脚本本身改动、或 git 命令失败时返回 None（表示全部验证）
+    """
+    try:
+        changed = subprocess.run(
+            ["git", "diff", "--name-only", ref, "--"],
+            capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        changed += subprocess.run(
+            ["git", "ls-files", "--others", "--exclude-standard"],
+            capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"⚠️  无法获取 {ref} 以来的改动，验证全部插件: {e}")
+        return None
+
+    plugins = set()
+    for name in changed:
+        if name.startswith(GLOBAL_PATHS):
+            return None
+        parts = Path(name).parts
+        if len(parts) >= 2 and parts[0] == "plugins":
+            plugins.add(parts[1])
+    return plugins
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Markdown frontmatter 解析
+只读取文件开头 --- 到结束 --- 之间的内容，用 YAML 解析（支持嵌套映射，如 input_schema），
+结果按 (路径, mtime, size) 缓存在 .ci-cache/frontmatter.json 中，跨运行复用
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from ci_cache import CACHE_DIR, rules_version
+
+try:
+    import yaml
+except ImportError:  # 只有真正解析 frontmatter 时才需要
+    yaml = None
+
+DELIMITER = b"---"
+
+# frontmatter 的最大字节数，超过仍未遇到结束标记视为没有 frontmatter
+MAX_HEADER_BYTES = 64 * 1024
+
+CACHE_FILE = CACHE_DIR / "frontmatter.json"
+
+# 已加载的缓存: {"路径": {"mtime_ns", "size", "data"}}
+_cache = None
+_dirty = False
+
+
+if yaml is not None:
+    class _FrontmatterLoader(yaml.SafeLoader):
+        """
+        SafeLoader，但日期和小数保持为字符串:
+        日期需要写入 JSON 缓存，小数形式的版本号（version: 1.10）不能变成 1.1
+        """
+
+    _STRING_TAGS = {"tag:yaml.org,2002:timestamp", "tag:yaml.org,2002:float"}
+    _FrontmatterLoader.yaml_implicit_resolvers = {
+        first: [(tag, regexp) for tag, regexp in resolvers if tag not in _STRING_TAGS]
+        for first, resolvers in yaml.SafeLoader.yaml_implicit_resolvers.items()
+    }
+
+
+def read_header(path: Path) -> Optional[str]:
+    """
+    逐行读取文件开头的 frontmatter，遇到结束的 --- 即停止，不读取正文
+
+    Returns:
+        两个 --- 之间的文本；文件不以 --- 开头或没有结束标记时返回 None
+    """
+    with open(path, "rb") as f:
+        first = f.readline(MAX_HEADER_BYTES)
+        if first.rstrip(b"\r\n") != DELIMITER:
+            return None
+
+        lines = []
+        size = len(first)
+        while size < MAX_HEADER_BYTES:
+            line = f.readline(MAX_HEADER_BYTES - size)
+            if not line:
+                return None
+            size += len(line)
+            if line.rstrip(b"\r\n") == DELIMITER:
+                return b"".join(lines).decode("utf-8")
+            lines.append(line)
+    return None
+
+
+def parse_frontmatter(text: str, source: str = "") -> Dict:
+    """用 YAML 解析 frontmatter 文本，格式错误或不是映射时返回空字典"""
+    if yaml is None:
+        raise ImportError("解析 frontmatter 需要 PyYAML: pip install pyyaml")
+
+    try:
+        data = yaml.load(text, Loader=_FrontmatterLoader)
+    except yaml.YAMLError as e:
+        print(f"⚠️  frontmatter 格式错误 {source}: {e}")
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _load_cache() -> Dict:
+    global _cache
+    if _cache is None:
+        _cache = {}
+        try:
+            with open(CACHE_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == rules_version(Path(__file__)):
+                _cache = data.get("entries", {})
+        except (OSError, json.JSONDecodeError):
+            pass
+    return _cache
+
+
+def load_frontmatter(path: Path) -> Dict:
+    """
+    文件的 frontmatter，(路径, mtime, size) 未变时直接使用缓存
+
+    Args:
+        path: Markdown 文件路径
+
+    Returns:
+        frontmatter 字典，没有 frontmatter 时为空字典
+    """
+    global _dirty
+    cache = _load_cache()
+    stat = path.stat()
+    key = str(path)
+
+    entry = cache.get(key)
+    if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return entry["data"]
+
+    header = read_header(path)
+    data = parse_frontmatter(header, key) if header is not None else {}
+    cache[key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "data": data}
+    _dirty = True
+    return data
+
+
+def save_cache():
+    """有新解析的文件时原子写回缓存"""
+    global _dirty
+    if not _dirty:
+        return
+    CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_FILE.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": rules_version(Path(__file__)), "entries": _cache}, f, ensure_ascii=False, default=str
+        )
+    os.replace(tmp_path, CACHE_FILE)
+    _dirty = False
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+仓库扫描器
+只遍历一次仓库，构建插件模型（marketplace、插件目录、待验证文件、MCP 配置、frontmatter），
+供引用检查、MCP 依赖检查、内容验证和 README 表格生成共同查询
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from frontmatter_parser import load_frontmatter
+
+MARKETPLACE_FILE = Path(".claude-plugin") / "marketplace.json"
+PROJECT_COMMANDS_DIR = Path(".claude") / "commands"
+
+# 插件子目录 → 文件类型（与 validate_content.FILE_RULES 的键一致）
+PLUGIN_FILE_DIRS = {"agents": "agent", "skills": "skill", "commands": "command"}
+
+
+def _list_markdown(directory: Path) -> List[Path]:
+    """目录下的 *.md（与 glob("*.md") 相同: 不含隐藏文件，保持目录顺序）"""
+    try:
+        with os.scandir(directory) as entries:
+            return [
+                directory / entry.name
+                for entry in entries
+                if entry.name.endswith(".md") and not entry.name.startswith(".")
+            ]
+    except OSError:
+        return []
+
+
+def scan_plugin(plugin_dir: Path) -> Dict:
+    """扫描单个插件目录的第一层和 agents/skills/commands 目录"""
+    plugin = {
+        "name": plugin_dir.name,
+        "path": plugin_dir,
+        "dirs": set(),
+        "has_readme": False,
+        "files": {kind: [] for kind in PLUGIN_FILE_DIRS.values()},
+        "mcp_config_path": plugin_dir / "tools" / ".mcp.json",
+    }
+
+    with os.scandir(plugin_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                plugin["dirs"].add(entry.name)
+            elif entry.name == "README.md":
+                plugin["has_readme"] = True
+
+    for dirname, kind in PLUGIN_FILE_DIRS.items():
+        if dirname in plugin["dirs"]:
+            plugin["files"][kind] = _list_markdown(plugin_dir / dirname)
+
+    return plugin
+
+
+def scan_repository(root: Path = Path(".")) -> Dict:
+    """
+    扫描仓库，构建插件模型
+
+    Args:
+        root: 仓库根目录
+
+    Returns:
+        dict: {
+            "root": 仓库根目录,
+            "marketplace_path": marketplace.json 路径,
+            "marketplace": 解析后的 marketplace（文件不存在或格式错误时为 None）,
+            "marketplace_error": JSON 格式错误信息（没有错误时为 None）,
+            "plugins_dir": plugins 目录,
+            "plugins": {插件名: 插件信息}（plugins 目录不存在时为空）,
+            "project_commands": .claude/commands 下的命令文件,
+            "frontmatter": {文件路径: frontmatter}（按需解析，见 get_frontmatter）
+        }
+    """
+    root = Path(root)
+    repo = {
+        "root": root,
+        "marketplace_path": root / MARKETPLACE_FILE,
+        "marketplace": None,
+        "marketplace_error": None,
+        "plugins_dir": root / "plugins",
+        "plugins": {},
+        "project_commands": _list_markdown(root / PROJECT_COMMANDS_DIR),
+        "frontmatter": {},
+    }
+
+    if repo["marketplace_path"].exists():
+        try:
+            with open(repo["marketplace_path"], "r", encoding="utf-8") as f:
+                repo["marketplace"] = json.load(f)
+        except json.JSONDecodeError as e:
+            repo["marketplace_error"] = str(e)
+
+    if repo["plugins_dir"].is_dir():
+        for plugin_dir in repo["plugins_dir"].iterdir():
+            if plugin_dir.is_dir():
+                repo["plugins"][plugin_dir.name] = scan_plugin(plugin_dir)
+
+    return repo
+
+
+def marketplace_plugins(repo: Dict) -> List[Dict]:
+    """marketplace.json 中注册的插件列表"""
+    return (repo["marketplace"] or {}).get("plugins", [])
+
+
+def plugin_file_tasks(plugin: Dict) -> List[Tuple[str, Path]]:
+    """插件中需要内容验证的文件: (文件类型, 路径)，README.md 在前"""
+    tasks = [("readme", plugin["path"] / "README.md")]
+    for kind in PLUGIN_FILE_DIRS.values():
+        tasks.extend((kind, path) for path in plugin["files"][kind])
+    return tasks
+
+
+def get_frontmatter(repo: Dict, path: Path) -> Dict:
+    """文件的 frontmatter，同一次扫描中每个文件只解析一次（README 生成器使用；跨运行的缓存见 frontmatter_parser）"""
+    if path not in repo["frontmatter"]:
+        repo["frontmatter"][path] = load_frontmatter(path)
+    return repo["frontmatter"][path]
+
+
+def select_plugins(repo: Dict, only: Optional[set] = None) -> List[Dict]:
+    """plugins 目录下的插件（only 不为 None 时只保留其中的插件）"""
+    plugins = list(repo["plugins"].values())
+    if only is not None:
+        plugins = [plugin for plugin in plugins if plugin["name"] in only]
+    return plugins
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+完整验证套件
+在同一个进程中只扫描一次仓库，依次运行引用检查、插件一致性检查、MCP 依赖检查和内容质量验证
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from check_mcp_dependencies import validate_all_mcp_dependencies
+from check_references import check_plugin_consistency, check_references
+from ci_cache import ResultCache, changed_plugins, rules_version
+from repo_scanner import scan_repository
+from validate_content import generate_summary_report, validate_all_plugins
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在一个进程中运行全部插件验证")
+    parser.add_argument("--changed-since", metavar="GIT_REF", help="只验证相对该 git 引用有改动的插件")
+    parser.add_argument("--jobs", type=int, help="内容验证的最大进程数（默认: CPU 核数，1 表示串行）")
+    parser.add_argument("--no-cache", action="store_true", help="不使用验证结果缓存")
+    args = parser.parse_args()
+
+    repo = scan_repository()
+    only = changed_plugins(args.changed_since) if args.changed_since else None
+    print(f"🔍 仓库扫描完成: {len(repo['plugins'])} 个插件")
+
+    print("\n🔍 开始文件引用检查...")
+    references_ok = check_references(repo, only)
+
+    print("\n🔍 检查插件配置一致性...")
+    consistency_ok = check_plugin_consistency(repo)
+
+    print("\n🔍 开始MCP依赖检查...")
+    mcp_cache = ResultCache(
+        "check_mcp_dependencies", rules_version(SCRIPTS_DIR / "check_mcp_dependencies.py"), enabled=not args.no_cache
+    )
+    mcp_results = validate_all_mcp_dependencies(repo, cache=mcp_cache, only=only)
+    mcp_ok = all(not r["issues"] for r in mcp_results)
+
+    print("\n🔍 开始内容质量验证...")
+    content_cache = ResultCache(
+        "validate_content", rules_version(SCRIPTS_DIR / "validate_content.py"), enabled=not args.no_cache
+    )
+    content_results = validate_all_plugins(repo, jobs=args.jobs, cache=content_cache, only=only)
+    summary = generate_summary_report(content_results)
+
+    for cache in (mcp_cache, content_cache):
+        if cache.enabled:
+            cache.save()
+            print(cache.summary())
+
+    print(f"\n📊 验证汇总:")
+    print(f"  {'✅' if references_ok else '❌'} 文件引用")
+    print(f"  {'✅' if consistency_ok else '❌'} 插件一致性")
+    print(f"  {'✅' if mcp_ok else '❌'} MCP依赖")
+    # 内容质量问题不阻塞（与工作流中单独运行 validate_content.py 一致）
+    print(f"  {'✅' if summary['total_issues'] == 0 else '⚠️ '} 内容质量: {summary['total_issues']} 个问题")
+
+    success = references_ok and consistency_ok and mcp_ok
+    if success:
+        print("\n🎉 所有验证通过!")
+    else:
+        print("\n❌ 验证失败!")
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
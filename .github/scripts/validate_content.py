@@ -4,45 +4,100 @@
 检查插件文档和代码内容的质量
 """
 
+import argparse
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
+
+from ci_cache import ResultCache, changed_plugins, rules_version
+from repo_scanner import plugin_file_tasks, scan_plugin, scan_repository, select_plugins
+
+# 预编译的规则模式（^ 与 MULTILINE 下的行首等价，逐行匹配）
+CODE_FENCE = "```"
+HEADING_PATTERN = re.compile(r"#+\s")
+SUBHEADING_PATTERN = re.compile(r"##+\s")
+LINK_PATTERN = re.compile(r"\[([^\]]*)\]\(([^)]*)\)")
+
+README_SECTIONS = ["功能", "使用", "安装"]
+TOOL_KEYWORDS = ["tool_use", "Tool", "工具", "mcp", "function"]
+GOAL_KEYWORDS = ["目标", "任务", "职责", "objective", "goal", "task"]
+DESCRIPTION_KEYWORDS = [
+    "功能",
+    "作用",
+    "描述",
+    "description",
+    "purpose",
+    "functionality",
+]
+EXAMPLE_KEYWORDS = ["示例", "例子", "example", "用法", "usage"]
+USAGE_KEYWORDS = ["用法", "使用", "usage", "参数", "parameter"]
+
+# 所有关键字合并为一个前瞻模式，一次扫描找出出现过的全部关键字；
+# 长的优先，同一位置被更长关键字覆盖的前缀关键字（如 function / functionality）在 scan_content 中补回
+ALL_KEYWORDS = sorted(
+    set(README_SECTIONS + TOOL_KEYWORDS + GOAL_KEYWORDS + DESCRIPTION_KEYWORDS + EXAMPLE_KEYWORDS + USAGE_KEYWORDS),
+    key=len,
+    reverse=True,
+)
+KEYWORD_PATTERN = re.compile("(?=(" + "|".join(map(re.escape, ALL_KEYWORDS)) + "))")
+
+# 文件数达到该值时才启用进程池，少量文件时进程启动开销大于收益
+PARALLEL_MIN_FILES = 64
+
+
+def scan_content(content: str) -> Dict:
+    """单次扫描文件内容，提取所有规则需要的信息"""
+    facts = {
+        "length": len(content.strip()),
+        "fences": 0,
+        "has_heading": False,
+        "has_subheading": False,
+        "links": [],
+        "keywords": set(),
+    }
 
+    lines = content.split("\n")
+    last = len(lines) - 1
+    for i, line in enumerate(lines):
+        if CODE_FENCE in line:
+            facts["fences"] += line.count(CODE_FENCE)
+        if line.startswith("#") and not facts["has_subheading"]:
+            text = line if i == last else line + "\n"
+            if HEADING_PATTERN.match(text):
+                facts["has_heading"] = True
+                facts["has_subheading"] = bool(SUBHEADING_PATTERN.match(text))
 
-def validate_readme(readme_path: Path) -> Tuple[bool, List[str]]:
-    """验证 README.md 文件质量"""
-    if not readme_path.exists():
-        return False, ["README.md 文件不存在"]
+    # 链接文本可以跨行，直接在全文上匹配
+    if "](" in content:
+        facts["links"] = LINK_PATTERN.findall(content)
+
+    found = {match.group(1) for match in KEYWORD_PATTERN.finditer(content)}
+    facts["keywords"] = found | {k for k in ALL_KEYWORDS if any(k in f for f in found)}
+    return facts
 
-    try:
-        with open(readme_path, "r", encoding="utf-8") as f:
-            content = f.read()
-    except Exception as e:
-        return False, [f"无法读取 README.md: {e}"]
 
+def check_readme(facts: Dict, path: Path) -> Tuple[bool, List[str]]:
+    """README.md 规则"""
     issues = []
     warnings = []
 
     # 检查文件长度
-    if len(content.strip()) < 100:
+    if facts["length"] < 100:
         warnings.append("README.md 内容过短 (< 100 字符)")
-    elif len(content.strip()) < 500:
+    elif facts["length"] < 500:
         warnings.append("README.md 内容偏短 (< 500 字符)")
 
     # 检查章节结构
-    if not re.search(r"^#+\s+", content, re.MULTILINE):
+    if not facts["has_heading"]:
         issues.append("README.md 缺少标题结构")
-    elif not re.search(r"^##+\s+", content, re.MULTILINE):
+    elif not facts["has_subheading"]:
         warnings.append("README.md 建议添加二级标题")
 
     # 检查必需章节
-    required_sections = ["功能", "使用", "安装"]
-    found_sections = []
-    for section in required_sections:
-        if re.search(section, content, re.IGNORECASE):
-            found_sections.append(section)
+    found_sections = [section for section in README_SECTIONS if section in facts["keywords"]]
 
     if len(found_sections) == 0:
         warnings.append("README.md 建议包含功能介绍、使用说明等章节")
@@ -50,13 +105,11 @@ def validate_readme(readme_path: Path) -> Tuple[bool, List[str]]:
         warnings.append(f"README.md 只包含部分推荐章节: {', '.join(found_sections)}")
 
     # 检查代码块
-    code_blocks = re.findall(r"```", content)
-    if len(code_blocks) % 2 != 0:
+    if facts["fences"] % 2 != 0:
         warnings.append("README.md 代码块标记不匹配")
 
     # 检查链接格式
-    broken_links = re.findall(r"\[([^\]]*)\]\(([^)]*)\)", content)
-    for text, url in broken_links:
+    for text, url in facts["links"]:
         if not url.strip():
             warnings.append(f"发现空链接: [{text}]()")
 
@@ -66,123 +119,129 @@ def validate_readme(readme_path: Path) -> Tuple[bool, List[str]]:
     return success, all_issues
 
 
-def validate_agent_file(agent_path: Path) -> Tuple[bool, List[str]]:
-    """验证 agent 文件质量"""
-    if not agent_path.exists():
-        return False, [f"Agent 文件不存在: {agent_path}"]
-
-    try:
-        with open(agent_path, "r", encoding="utf-8") as f:
-            content = f.read()
-    except Exception as e:
-        return False, [f"无法读取 agent 文件 {agent_path}: {e}"]
-
+def check_agent(facts: Dict, path: Path) -> Tuple[bool, List[str]]:
+    """agent 文件规则"""
     issues = []
+    keywords = facts["keywords"]
 
     # 检查文件长度
-    if len(content.strip()) < 100:
-        issues.append(f"Agent 文件过短: {agent_path.name}")
+    if facts["length"] < 100:
+        issues.append(f"Agent 文件过短: {path.name}")
 
     # 检查是否包含工具调用相关内容
-    tool_keywords = ["tool_use", "Tool", "工具", "mcp", "function"]
-    has_tool_references = any(keyword in content for keyword in tool_keywords)
-
-    if not has_tool_references:
-        issues.append(f"Agent 文件可能缺少工具定义: {agent_path.name}")
+    if not any(keyword in keywords for keyword in TOOL_KEYWORDS):
+        issues.append(f"Agent 文件可能缺少工具定义: {path.name}")
 
     # 检查是否有明确的目标描述
-    goal_keywords = ["目标", "任务", "职责", "objective", "goal", "task"]
-    has_goal_description = any(keyword in content for keyword in goal_keywords)
-
-    if not has_goal_description:
-        issues.append(f"Agent 文件缺少明确的目标描述: {agent_path.name}")
+    if not any(keyword in keywords for keyword in GOAL_KEYWORDS):
+        issues.append(f"Agent 文件缺少明确的目标描述: {path.name}")
 
     # 检查代码块格式
-    code_blocks = re.findall(r"```", content)
-    if len(code_blocks) % 2 != 0:
-        issues.append(f"Agent 文件代码块标记不匹配: {agent_path.name}")
+    if facts["fences"] % 2 != 0:
+        issues.append(f"Agent 文件代码块标记不匹配: {path.name}")
 
     success = len(issues) == 0
     return success, issues
 
 
-def validate_skill_file(skill_path: Path) -> Tuple[bool, List[str]]:
-    """验证 skill 文件质量"""
-    if not skill_path.exists():
-        return False, [f"Skill 文件不存在: {skill_path}"]
-
-    try:
-        with open(skill_path, "r", encoding="utf-8") as f:
-            content = f.read()
-    except Exception as e:
-        return False, [f"无法读取 skill 文件 {skill_path}: {e}"]
-
+def check_skill(facts: Dict, path: Path) -> Tuple[bool, List[str]]:
+    """skill 文件规则"""
     issues = []
+    keywords = facts["keywords"]
 
     # 检查文件长度
-    if len(content.strip()) < 50:
-        issues.append(f"Skill 文件过短: {skill_path.name}")
-    elif len(content.strip()) < 200:
-        issues.append(f"Skill 文件内容偏少: {skill_path.name}")
+    if facts["length"] < 50:
+        issues.append(f"Skill 文件过短: {path.name}")
+    elif facts["length"] < 200:
+        issues.append(f"Skill 文件内容偏少: {path.name}")
 
     # 检查是否有功能描述
-    description_keywords = [
-        "功能",
-        "作用",
-        "描述",
-        "description",
-        "purpose",
-        "functionality",
-    ]
-    has_description = any(keyword in content for keyword in description_keywords)
-
-    if not has_description:
-        issues.append(f"Skill 文件缺少功能描述: {skill_path.name}")
+    if not any(keyword in keywords for keyword in DESCRIPTION_KEYWORDS):
+        issues.append(f"Skill 文件缺少功能描述: {path.name}")
 
     # 检查是否有使用示例
-    example_keywords = ["示例", "例子", "example", "用法", "usage"]
-    has_examples = any(keyword in content for keyword in example_keywords)
+    if not any(keyword in keywords for keyword in EXAMPLE_KEYWORDS):
+        issues.append(f"Skill 文件建议添加使用示例: {path.name}")
+
+    success = len(issues) == 0
+    return success, issues
+
 
-    if not has_examples:
-        issues.append(f"Skill 文件建议添加使用示例: {skill_path.name}")
+def check_command(facts: Dict, path: Path) -> Tuple[bool, List[str]]:
+    """命令文件规则"""
+    issues = []
+
+    # 检查是否有命令描述
+    if facts["length"] == 0:
+        issues.append(f"命令文件为空: {path.name}")
+    elif not any(keyword in facts["keywords"] for keyword in USAGE_KEYWORDS):
+        # 检查是否有使用说明
+        issues.append(f"命令文件建议添加使用说明: {path.name}")
 
     success = len(issues) == 0
     return success, issues
 
 
-def validate_command_file(command_path: Path) -> Tuple[bool, List[str]]:
-    """验证命令文件质量"""
-    if not command_path.exists():
-        return True, []  # 命令文件是可选的
+# 文件类型 → (文件不存在时的结果, 读取失败的提示, 规则)
+FILE_RULES = {
+    "readme": (lambda path: (False, ["README.md 文件不存在"]), "无法读取 README.md: {error}", check_readme),
+    "agent": (lambda path: (False, [f"Agent 文件不存在: {path}"]), "无法读取 agent 文件 {path}: {error}", check_agent),
+    "skill": (lambda path: (False, [f"Skill 文件不存在: {path}"]), "无法读取 skill 文件 {path}: {error}", check_skill),
+    "command": (lambda path: (True, []), "无法读取命令文件 {path}: {error}", check_command),  # 命令文件是可选的
+}
+
+
+def validate_file(task: Tuple[str, Path]) -> Tuple[bool, List[str]]:
+    """
+    验证单个文件: 只读取一次，单次扫描后应用该类型的全部规则
+
+    Args:
+        task: (文件类型, 文件路径)，文件类型见 FILE_RULES
+
+    Returns:
+        (是否通过, 问题列表)
+    """
+    kind, path = task
+    on_missing, read_error, check = FILE_RULES[kind]
+    if not path.exists():
+        return on_missing(path)
 
     try:
-        with open(command_path, "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             content = f.read()
     except Exception as e:
-        return False, [f"无法读取命令文件 {command_path}: {e}"]
+        return False, [read_error.format(path=path, error=e)]
 
-    issues = []
+    return check(scan_content(content), path)
 
-    # 检查是否有命令描述
-    if not content.strip():
-        issues.append(f"命令文件为空: {command_path.name}")
-    else:
-        # 检查是否有使用说明
-        usage_keywords = ["用法", "使用", "usage", "参数", "parameter"]
-        has_usage = any(keyword in content for keyword in usage_keywords)
 
-        if not has_usage:
-            issues.append(f"命令文件建议添加使用说明: {command_path.name}")
+def validate_readme(readme_path: Path) -> Tuple[bool, List[str]]:
+    """验证 README.md 文件质量"""
+    return validate_file(("readme", readme_path))
 
-    success = len(issues) == 0
-    return success, issues
 
+def validate_agent_file(agent_path: Path) -> Tuple[bool, List[str]]:
+    """验证 agent 文件质量"""
+    return validate_file(("agent", agent_path))
 
-def validate_plugin_content(plugin_path: Path) -> Dict:
-    """验证单个插件的内容质量"""
-    plugin_name = plugin_path.name
-    print(f"  🔍 验证插件内容: {plugin_name}")
 
+def validate_skill_file(skill_path: Path) -> Tuple[bool, List[str]]:
+    """验证 skill 文件质量"""
+    return validate_file(("skill", skill_path))
+
+
+def validate_command_file(command_path: Path) -> Tuple[bool, List[str]]:
+    """验证命令文件质量"""
+    return validate_file(("command", command_path))
+
+
+def collect_plugin_files(plugin_path: Path) -> List[Tuple[str, Path]]:
+    """列出插件中需要验证的文件: README.md、agents/、skills/、commands/ (可选) 下的 .md"""
+    return plugin_file_tasks(scan_plugin(plugin_path))
+
+
+def build_plugin_result(plugin_name: str, file_results: List[Tuple[bool, List[str]]]) -> Dict:
+    """把单个插件各文件的验证结果汇总为结果字典"""
     results = {
         "plugin_name": plugin_name,
         "success": True,
@@ -192,64 +251,105 @@ def validate_plugin_content(plugin_path: Path) -> Dict:
         "valid_files": 0,
     }
 
-    # 验证 README.md
-    readme_path = plugin_path / "README.md"
-    success, issues = validate_readme(readme_path)
-    results["success"] &= success
-    results["issues"].extend(issues)
-    results["file_count"] += 1
-    if success:
-        results["valid_files"] += 1
-
-    # 验证 agents
-    agents_dir = plugin_path / "agents"
-    if agents_dir.exists():
-        for agent_file in agents_dir.glob("*.md"):
-            success, issues = validate_agent_file(agent_file)
-            results["success"] &= success
-            results["issues"].extend(issues)
-            results["file_count"] += 1
-            if success:
-                results["valid_files"] += 1
-
-    # 验证 skills
-    skills_dir = plugin_path / "skills"
-    if skills_dir.exists():
-        for skill_file in skills_dir.glob("*.md"):
-            success, issues = validate_skill_file(skill_file)
-            results["success"] &= success
-            results["issues"].extend(issues)
-            results["file_count"] += 1
-            if success:
-                results["valid_files"] += 1
-
-    # 验证 commands (可选)
-    commands_dir = plugin_path / "commands"
-    if commands_dir.exists():
-        for command_file in commands_dir.glob("*.md"):
-            success, issues = validate_command_file(command_file)
-            results["success"] &= success
-            results["issues"].extend(issues)
-            results["file_count"] += 1
-            if success:
-                results["valid_files"] += 1
+    for success, issues in file_results:
+        results["success"] &= success
+        results["issues"].extend(issues)
+        results["file_count"] += 1
+        if success:
+            results["valid_files"] += 1
 
     return results
 
 
-def validate_all_plugins(plugins_dir: Path) -> List[Dict]:
-    """验证所有插件的内容质量"""
-    if not plugins_dir.exists():
+def run_file_tasks(
+    tasks: List[Tuple[str, Path]], jobs: int = None, cache: Optional[ResultCache] = None
+) -> List[Tuple[bool, List[str]]]:
+    """
+    验证一组文件，内容未变的文件直接使用缓存结果
+
+    缓存在主进程中查询，只有未命中的文件才分发到进程池。
+
+    Args:
+        tasks: (文件类型, 文件路径) 列表
+        jobs: 最大进程数，默认 CPU 核数；1 表示不使用进程池
+        cache: 结果缓存，None 表示不使用
+
+    Returns:
+        与 tasks 顺序一致的 (是否通过, 问题列表)
+    """
+    file_results = [None] * len(tasks)
+    pending = []
+    for i, (kind, path) in enumerate(tasks):
+        cached = cache.get(path) if cache else None
+        if cached is None:
+            pending.append(i)
+        else:
+            file_results[i] = (cached[0], cached[1])
+
+    pending_tasks = [tasks[i] for i in pending]
+    if jobs != 1 and len(pending_tasks) >= PARALLEL_MIN_FILES:
+        workers = jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            computed = list(
+                pool.map(validate_file, pending_tasks, chunksize=max(1, len(pending_tasks) // (workers * 4)))
+            )
+    else:
+        computed = [validate_file(task) for task in pending_tasks]
+
+    for i, result in zip(pending, computed):
+        file_results[i] = result
+        # 文件不存在的结果不缓存
+        if cache and tasks[i][1].exists():
+            cache.put(tasks[i][1], list(result))
+
+    return file_results
+
+
+def validate_plugin_content(plugin_path: Path, cache: Optional[ResultCache] = None) -> Dict:
+    """验证单个插件的内容质量"""
+    print(f"  🔍 验证插件内容: {plugin_path.name}")
+    file_results = run_file_tasks(collect_plugin_files(plugin_path), jobs=1, cache=cache)
+    return build_plugin_result(plugin_path.name, file_results)
+
+
+def validate_all_plugins(
+    repo: Dict,
+    jobs: int = None,
+    cache: Optional[ResultCache] = None,
+    only: Optional[Set[str]] = None,
+) -> List[Dict]:
+    """
+    验证所有插件的内容质量
+
+    所有插件的文件展开为一个任务列表，文件较多时分发到进程池并行验证，
+    再按插件顺序组装结果，输出与逐个验证相同。
+
+    Args:
+        repo: scan_repository() 的结果
+        jobs: 最大进程数，默认 CPU 核数；1 表示不使用进程池
+        cache: 结果缓存，None 表示不使用
+        only: 只验证这些插件（--changed-since），None 表示全部
+    """
+    if not repo["plugins_dir"].exists():
         print("❌ plugins 目录不存在")
         return []
 
-    results = []
-    plugin_dirs = [d for d in plugins_dir.iterdir() if d.is_dir()]
+    plugins = select_plugins(repo, only)
+    if only is not None:
+        print(f"⏭️  跳过 {len(repo['plugins']) - len(plugins)} 个未改动的插件")
+
+    print(f"🔍 验证 {len(plugins)} 个插件的内容质量...")
 
-    print(f"🔍 验证 {len(plugin_dirs)} 个插件的内容质量...")
+    plugin_tasks = [plugin_file_tasks(plugin) for plugin in plugins]
+    tasks = [task for file_tasks in plugin_tasks for task in file_tasks]
+    file_results = run_file_tasks(tasks, jobs=jobs, cache=cache)
 
-    for plugin_dir in plugin_dirs:
-        result = validate_plugin_content(plugin_dir)
+    results = []
+    offset = 0
+    for plugin, file_tasks in zip(plugins, plugin_tasks):
+        print(f"  🔍 验证插件内容: {plugin['name']}")
+        result = build_plugin_result(plugin["name"], file_results[offset:offset + len(file_tasks)])
+        offset += len(file_tasks)
         results.append(result)
 
         # 显示简短结果
@@ -283,19 +383,39 @@ def generate_summary_report(results: List[Dict]) -> Dict:
 
 
 def main():
-    if len(sys.argv) > 1:
+    parser = argparse.ArgumentParser(description="检查插件文档和代码内容的质量")
+    parser.add_argument("plugin_path", nargs="?", help="只验证指定插件目录（默认: plugins/ 下全部插件）")
+    parser.add_argument("--jobs", type=int, help="并行验证的最大进程数（默认: CPU 核数，1 表示串行）")
+    parser.add_argument("--changed-since", metavar="GIT_REF", help="只验证相对该 git 引用有改动的插件")
+    parser.add_argument("--no-cache", action="store_true", help="不使用验证结果缓存")
+    args = parser.parse_args()
+
+    cache = ResultCache("validate_content", rules_version(Path(__file__)), enabled=not args.no_cache)
+    only = changed_plugins(args.changed_since) if args.changed_since else None
+
+    if args.plugin_path:
         # 验证指定插件
-        plugin_path = Path(sys.argv[1])
+        plugin_path = Path(args.plugin_path)
         if not plugin_path.exists():
             print(f"❌ 插件路径不存在: {plugin_path}")
             return False
 
+        if only is not None and plugin_path.name not in only:
+            print(f"⏭️  {plugin_path.name} 自 {args.changed_since} 以来没有改动，跳过验证")
+            return True
+
         print(f"🔍 验证单个插件内容质量: {plugin_path.name}")
-        results = [validate_plugin_content(plugin_path)]
+        results = [validate_plugin_content(plugin_path, cache=cache)]
     else:
         # 验证所有插件
-        plugins_dir = Path("plugins")
-        results = validate_all_plugins(plugins_dir)
+        results = validate_all_plugins(scan_repository(), jobs=args.jobs, cache=cache, only=only)
+        if only is not None and not results:
+            print(f"✅ 自 {args.changed_since} 以来没有插件改动")
+            return True
+
+    if cache.enabled:
+        cache.save()
+        print(cache.summary())
 
     if not results:
         print("❌ 没有找到插件进行验证")
@@ -0,0 +1,65 @@
+"""
+Manim Builder 基准测试场景集
+覆盖常见的讲义场景类型，全部使用 manim-tools 工具函数构建
+
+由 scripts/benchmark.py 渲染，manim-tools/scripts 会被加入 PYTHONPATH。
+修改场景会使已保存的基线失效，请同时更新基线。
+"""
+
+from manim import *
+from tools import *
+
+
+class FunctionPlots(Scene):
+    """函数绘图: 坐标系 + 正弦/余弦 + 导数 + 积分面积"""
+
+    def construct(self):
+        axes = Axes(x_range=[-4, 4], y_range=[-2, 2])
+        sine = plot_sine(axes=axes)
+        cosine = plot_cosine(axes=axes)
+        self.play(Create(axes))
+        self.play(Create(sine), Create(cosine))
+        self.play(Create(plot_derivative(lambda x: x ** 3 / 8, axes=axes)))
+        self.play(FadeIn(plot_integral(lambda x: 0.5 * x ** 2, x_range=(0, 1.5), axes=axes)))
+        self.wait()
+
+
+class BulletList(Scene):
+    """文本: 标题 + 长列表"""
+
+    def construct(self):
+        title = create_title("Agenda").to_edge(UP)
+        bullets = create_bullet_points([f"Topic {i}" for i in range(1, 9)], font_size=28)
+        bullets.next_to(title, DOWN)
+        self.play(Write(title))
+        self.play(Write(bullets))
+        self.wait()
+
+
+class Formulas(Scene):
+    """公式: 多个 MathTex（依赖 LaTeX）"""
+
+    def construct(self):
+        formulas = VGroup(
+            create_formula(r"E = mc^2"),
+            create_formula(r"\int_0^\infty e^{-x^2} dx = \frac{\sqrt{\pi}}{2}"),
+            create_formula(r"\sum_{n=1}^\infty \frac{1}{n^2} = \frac{\pi^2}{6}"),
+            create_formula(r"e^{i\pi} + 1 = 0")
+        ).arrange(DOWN)
+        for formula in formulas:
+            self.play(fade_in_transform(formula))
+        self.wait()
+
+
+class Transforms(Scene):
+    """几何变换: 创建、变形、旋转缩放"""
+
+    def construct(self):
+        circle = create_circle()
+        square = create_square()
+        polygon = create_polygon(6)
+        self.play(grow_from_center(circle))
+        self.play(morph_transform(circle, square))
+        self.play(Rotate(circle, angle=PI / 2))
+        self.play(morph_transform(circle, polygon))
+        self.wait()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Manim Builder Benchmark
+渲染吞吐量基准测试
+
+对固定的场景集（benchmarks/corpus.py，由 manim-tools 工具函数构建）在每个 QUALITY_MAP
+预设下调用 build_scene，统计每个场景的耗时、渲染帧率和缓存命中率，并与已保存的基线比较。
+
+每个 (场景, 质量) 运行 --repeat 次，使用独立的基准缓存目录（每次开始时清空）:
+    第 1 次: 冷启动，真实渲染，计入耗时和帧率
+    之后:    热启动，应命中渲染缓存，计入缓存命中率和热启动耗时
+
+使用方法:
+    python benchmark.py
+    python benchmark.py --qualities low,medium --repeat 3
+    python benchmark.py --save-baseline
+    python benchmark.py --threshold 0.15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import build
+
+SKILL_DIR = Path(__file__).resolve().parent.parent
+CORPUS_FILE = SKILL_DIR / "benchmarks" / "corpus.py"
+DEFAULT_BASELINE = SKILL_DIR / "benchmarks" / "baseline.json"
+TOOLS_DIR = SKILL_DIR.parent / "manim-tools" / "scripts"
+
+# 基准测试专用目录，不污染正常构建的缓存
+BENCHMARK_DIR = build.OUTPUT_BASE_DIR / "benchmarks"
+
+# 冷启动耗时超过基线的比例阈值
+DEFAULT_THRESHOLD = 0.2
+
+
+def use_isolated_caches():
+    """把渲染缓存和片段缓存指向清空后的基准测试目录"""
+    cache_dir = BENCHMARK_DIR / "cache"
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    build.RENDER_CACHE_DIR = cache_dir / "renders"
+    build.SEGMENT_CACHE_DIR = cache_dir / "segments"
+
+
+def read_metrics(output_dir: Path) -> dict:
+    """读取一次构建的 metrics.json"""
+    metrics_file = Path(output_dir) / "metrics.json"
+    if not metrics_file.exists():
+        return {}
+    with open(metrics_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_benchmark(scenes: list, qualities: list, repeat: int, engine: str) -> dict:
+    """
+    运行基准测试
+
+    Args:
+        scenes: 场景类名列表
+        qualities: 质量预设列表
+        repeat: 每个 (场景, 质量) 的运行次数
+        engine: 渲染引擎
+
+    Returns:
+        dict: {"<quality>": {"scenes": {...}, "summary": {...}}}
+    """
+    results = {}
+    for quality in qualities:
+        scene_results = {}
+        for scene_name in scenes:
+            runs = []
+            for i in range(repeat):
+                captured = io.StringIO()
+                with contextlib.redirect_stdout(captured):
+                    success, output_dir = build.build_scene(
+                        str(CORPUS_FILE), scene_name, quality, engine=engine
+                    )
+                metrics = read_metrics(output_dir) if output_dir else {}
+                metrics["success"] = success
+                runs.append(metrics)
+                status = "✅" if success else "❌"
+                hit = " (缓存)" if metrics.get("cache_hit") else ""
+                print(f"  {status} {quality:<6} {scene_name:<16} #{i + 1}: {metrics.get('wall_time', 0):.2f}s{hit}")
+                if not success:
+                    print(captured.getvalue())
+                    break
+
+            cold = runs[0]
+            warm = runs[1:]
+            scene_results[scene_name] = {
+                "success": all(r["success"] for r in runs),
+                "cold_seconds": cold.get("wall_time"),
+                "frames": cold.get("frames"),
+                "frames_per_second": cold.get("frames_per_second"),
+                "phases": cold.get("phases", {}),
+                "peak_rss_bytes": cold.get("peak_rss_bytes"),
+                "warm_seconds": statistics.mean(r.get("wall_time", 0) for r in warm) if warm else None,
+                "cache_hits": sum(1 for r in warm if r.get("cache_hit")),
+                "warm_runs": len(warm)
+            }
+
+        ok = [r for r in scene_results.values() if r["success"]]
+        warm_runs = sum(r["warm_runs"] for r in ok)
+        fps_values = [r["frames_per_second"] for r in ok if r["frames_per_second"]]
+        results[quality] = {
+            "scenes": scene_results,
+            "summary": {
+                "scenes": len(scene_results),
+                "failed": len(scene_results) - len(ok),
+                "seconds_per_scene": round(statistics.mean(r["cold_seconds"] for r in ok), 3) if ok else None,
+                "frames_per_second": round(statistics.mean(fps_values), 2) if fps_values else None,
+                "cache_hit_rate": round(sum(r["cache_hits"] for r in ok) / warm_runs, 3) if warm_runs else None
+            }
+        }
+    return results
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    与基线比较冷启动耗时
+
+    Args:
+        results: 本次结果
+        baseline: 基线结果（同样的结构）
+        threshold: 允许的变慢比例
+
+    Returns:
+        list[str]: 回归描述，空列表表示没有回归
+    """
+    regressions = []
+    for quality, data in results.items():
+        base_scenes = baseline.get("results", {}).get(quality, {}).get("scenes", {})
+        for scene_name, current in data["scenes"].items():
+            base = base_scenes.get(scene_name)
+            if not base or not base.get("cold_seconds") or not current.get("cold_seconds"):
+                continue
+            ratio = current["cold_seconds"] / base["cold_seconds"] - 1
+            marker = "⚠️ " if ratio > threshold else "  "
+            print(f"{marker}{quality:<6} {scene_name:<16} {base['cold_seconds']:.2f}s → {current['cold_seconds']:.2f}s ({ratio:+.1%})")
+            if ratio > threshold:
+                regressions.append(f"{quality}/{scene_name}: {ratio:+.1%}")
+    return regressions
+
+
+def _format_optional(value, spec: str) -> str:
+    """按格式说明输出数值，没有数据时输出 -"""
+    return format(value, spec) if value is not None else "-"
+
+
+def print_summary(results: dict):
+    """输出各质量预设的汇总表"""
+    print(f"\n{'质量':<8}{'场景数':>6}{'秒/场景':>10}{'帧/秒':>10}{'缓存命中率':>12}")
+    for quality, data in results.items():
+        summary = data["summary"]
+        print(
+            f"{quality:<8}{summary['scenes']:>6}"
+            f"{_format_optional(summary['seconds_per_scene'], '.2f'):>10}"
+            f"{_format_optional(summary['frames_per_second'], '.1f'):>10}"
+            f"{_format_optional(summary['cache_hit_rate'], '.0%'):>12}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Manim Builder 渲染吞吐量基准测试",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  %(prog)s --qualities low,medium
+  %(prog)s --save-baseline
+  %(prog)s --baseline benchmarks/baseline.json --threshold 0.15
+        """
+    )
+    parser.add_argument(
+        "--qualities",
+        default=",".join(build.QUALITY_MAP.keys()),
+        help=f"逗号分隔的质量预设（默认: {','.join(build.QUALITY_MAP.keys())}）"
+    )
+    parser.add_argument("--scenes", help="逗号分隔的场景名（默认: 场景集中的全部场景）")
+    parser.add_argument("--repeat", type=int, default=2, help="每个场景的运行次数，第 1 次为冷启动（默认: 2）")
+    parser.add_argument("--engine", choices=build.ENGINE_CHOICES, default="cli", help="渲染引擎（默认: cli）")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"冷启动耗时超过基线的回归阈值（默认: {DEFAULT_THRESHOLD}）"
+    )
+    args = parser.parse_args()
+
+    qualities = [q.strip() for q in args.qualities.split(",") if q.strip()]
+    invalid = [q for q in qualities if q not in build.QUALITY_MAP]
+    if invalid:
+        parser.error(f"无效的质量参数: {', '.join(invalid)}")
+
+    if not build.check_manim_installed():
+        print("❌ 错误: manim 未安装")
+        print("   请运行: pip install manim")
+        sys.exit(1)
+
+    scenes = args.scenes.split(",") if args.scenes else build.discover_scenes(str(CORPUS_FILE))
+
+    # 场景集通过 `from tools import *` 使用 manim-tools
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [str(TOOLS_DIR), os.environ.get("PYTHONPATH")]))
+    sys.path.insert(0, str(TOOLS_DIR))
+    use_isolated_caches()
+
+    manim_version = build.get_manim_version()
+    print(f"📊 基准测试: {len(scenes)} 个场景 × {len(qualities)} 个质量 × {args.repeat} 次")
+    print(f"🔧 {manim_version}，引擎: {args.engine}")
+    print("-" * 50)
+
+    results = run_benchmark(scenes, qualities, args.repeat, args.engine)
+    print_summary(results)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "manim_version": manim_version,
+        "engine": args.engine,
+        "repeat": args.repeat,
+        "results": results
+    }
+    BENCHMARK_DIR.mkdir(parents=True, exist_ok=True)
+    report_file = BENCHMARK_DIR / f"benchmark_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n📋 结果: {report_file}")
+
+    baseline_file = Path(args.baseline)
+    if args.save_baseline:
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 基线已保存: {baseline_file}")
+        sys.exit(0)
+
+    if not baseline_file.exists():
+        print(f"ℹ️  未找到基线 {baseline_file}，跳过比较（使用 --save-baseline 创建）")
+        sys.exit(0)
+
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("manim_version") != manim_version:
+        print(f"ℹ️  基线 manim 版本: {baseline.get('manim_version')}")
+
+    print(f"\n📈 与基线比较（阈值 {args.threshold:.0%}）:")
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ 发现 {len(regressions)} 项性能回归:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+    print("\n✅ 没有性能回归")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,72 +8,254 @@ manim_outputs/
 └── <scene_name>_<timestamp>/
     ├── scene.py                   # 源代码
     ├── config.json                # 生成配置
+    ├── metrics.json               # 构建指标（各阶段耗时、帧率、峰值内存、产物大小）
     ├── output/
     │   └── <quality>/
     │       └── <SceneName>.mp4
+    ├── media/                     # manim 工作目录（含片段文件，用于续渲染）
     ├── logs/
     │   ├── build.log
+    │   ├── progress.jsonl
     │   └── manim.log
     └── README.md
 
 使用方法:
     python build.py scene.py MyScene
     python build.py scene.py MyScene --quality high
+    python build.py scene.py --scene MyScene --resume manim_outputs/MyScene_<timestamp>
 """
 
 import argparse
+import ast
+import contextlib
+import fnmatch
+import hashlib
+import io
 import json
 import os
+import re
 import shutil
 import subprocess
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 # 质量配置映射
 QUALITY_MAP = {
     "low": {
         "flag": "-ql",
         "name": "480p",
         "resolution": "854x480",
-        "frame_rate": 15
+        "frame_rate": 15,
+        "seconds_per_frame": 0.02,
+        "manim_dir": "480p15",
+        "manim_quality": "low_quality"
     },
     "medium": {
         "flag": "-qm",
         "name": "720p",
         "resolution": "1280x720",
-        "frame_rate": 30
+        "frame_rate": 30,
+        "seconds_per_frame": 0.05,
+        "manim_dir": "720p30",
+        "manim_quality": "medium_quality"
     },
     "high": {
         "flag": "-qh",
         "name": "1080p",
         "resolution": "1920x1080",
-        "frame_rate": 30
+        "frame_rate": 30,
+        "seconds_per_frame": 0.1,
+        "manim_dir": "1080p60",
+        "manim_quality": "high_quality"
     },
     "4k": {
         "flag": "-qk",
         "name": "2160p",
         "resolution": "3840x2160",
-        "frame_rate": 60
+        "frame_rate": 60,
+        "seconds_per_frame": 0.4,
+        "manim_dir": "2160p60",
+        "manim_quality": "fourk_quality"
     }
 }
 
+# 渲染引擎: cli 每个场景启动一次 manim 命令；inprocess 在当前进程中导入 manim 一次；
+# worker 使用常驻工作进程（见 engine.py），跳过重复的导入开销
+ENGINE_CHOICES = ["cli", "inprocess", "worker"]
+
+# 支持的输出格式（mp4 为渲染结果本身，其余由 export_formats 一次解码生成）
+FORMAT_CHOICES = ["mp4", "gif", "png", "webm", "sprite"]
+
+# GIF 默认帧率（--gif-fps、export_to_gif 和多格式导出共用）
+GIF_FPS = 15
+
+# 缩略图拼图: 列 x 行，单格宽度
+SPRITE_GRID = (5, 5)
+SPRITE_TILE_WIDTH = 320
+
 # 输出基础目录
 OUTPUT_BASE_DIR = Path("manim_outputs")
 
+# manim 渲染超时（秒）: 自适应估算结果的下限
+RENDER_TIMEOUT = 300
+
+# 超时估算: 固定开销（启动 + 导入）和安全系数
+TIMEOUT_BASE_SECONDS = 60
+TIMEOUT_SAFETY_FACTOR = 3
+
+# 超时或崩溃后从已渲染片段继续的最大次数
+MAX_RESUMES = 2
+
+# 失败时回显的日志尾部行数（流式读取时内存只保留这么多行）
+LOG_TAIL_LINES = 50
+
+# manim 进度条: "Animation 3: Create(Circle):  45%|████▌     | 27/60 [...]"
+PROGRESS_PATTERN = re.compile(r"Animation (\d+)\s*:\s*(.*?):\s*(\d+)%\|.*?\|\s*(\d+)/(\d+)")
+# 片段完成: "Animation 3 : Partial movie file written in ..."
+PARTIAL_DONE_PATTERN = re.compile(r"Animation (\d+)\s*:\s*Partial movie file written")
+
+# 构建索引: 记录每个构建目录的场景、质量、大小和最近使用时间，列出构建无需遍历目录
+BUILD_INDEX_FILE = OUTPUT_BASE_DIR / "index.json"
+
+# 保留策略配置（可选）: {"max_bytes": ..., "max_age_days": ..., "pinned": ["MyScene_*", ...]}
+RETENTION_CONFIG_FILE = OUTPUT_BASE_DIR / "retention.json"
+
+# 默认保留策略: 构建目录总大小上限和最长保留天数
+RETENTION_MAX_BYTES = 20 * 1024 ** 3
+RETENTION_MAX_AGE_DAYS = 90
+
+# 每个构建目录中的产物清单（路径、大小、sha256）
+BUILD_MANIFEST_NAME = "manifest.json"
+
+# 构建指标的全局历史（每次构建 / 导出追加一行 JSON）
+METRICS_HISTORY_FILE = OUTPUT_BASE_DIR / "metrics_history.jsonl"
+
+# 外部工具探测结果缓存（版本、能力），按可执行文件路径和 mtime 失效
+TOOL_CACHE_FILE = OUTPUT_BASE_DIR / ".cache" / "tools.json"
+
+# 渲染缓存目录（内容寻址，按 源码 + 场景名 + 质量 + manim 版本 索引）
+RENDER_CACHE_DIR = OUTPUT_BASE_DIR / ".cache" / "renders"
+
+# 渲染缓存淘汰策略
+CACHE_MAX_BYTES = 2 * 1024 ** 3   # 总大小上限: 2 GiB
+CACHE_MAX_AGE_DAYS = 30           # 超过 30 天未使用的条目会被清理
+
+# 动画片段缓存: manim 的 partial movie 文件以动画哈希命名，跨构建目录共享
+SEGMENT_CACHE_DIR = OUTPUT_BASE_DIR / ".cache" / "segments"
+SEGMENT_CACHE_MAX_BYTES = 4 * 1024 ** 3
+
+
+def _probe_manim(path: str) -> dict:
+    """探测 manim 版本和 LaTeX 支持"""
+    result = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=30)
+    if result.returncode != 0:
+        return None
+    return {
+        "version": result.stdout.strip(),
+        "capabilities": {
+            "latex": bool(shutil.which("latex") and shutil.which("dvisvgm"))
+        }
+    }
+
+
+def _probe_ffmpeg(path: str) -> dict:
+    """探测 ffmpeg 版本和可用编码器"""
+    result = subprocess.run([path, "-version"], capture_output=True, text=True, timeout=10)
+    if result.returncode != 0:
+        return None
+    version = result.stdout.splitlines()[0] if result.stdout else "unknown"
+
+    encoders = []
+    result = subprocess.run([path, "-hide_banner", "-encoders"], capture_output=True, text=True, timeout=10)
+    for line in result.stdout.splitlines():
+        # 形如: " V....D libvpx-vp9           libvpx VP9 (codec vp9)"
+        parts = line.split()
+        if len(parts) >= 2 and len(parts[0]) == 6 and parts[0][0] in "VAS" and parts[1] != "=":
+            encoders.append(parts[1])
+
+    return {
+        "version": version,
+        "capabilities": {"encoders": encoders}
+    }
+
+
+# 工具探测函数: 名称 → 探测函数
+TOOL_PROBES = {
+    "manim": _probe_manim,
+    "ffmpeg": _probe_ffmpeg
+}
+
+# 进程内的探测结果（同一进程只读一次磁盘缓存）
+_TOOL_INFO = {}
+
+
+def get_tool_info(name: str) -> dict:
+    """
+    获取外部工具的版本和能力，只在可执行文件变化时重新探测
+
+    结果缓存在 TOOL_CACHE_FILE 中，按 可执行文件路径 + mtime（以及 LaTeX 路径）索引，
+    在多次构建和批量工作进程之间共享。
+
+    Args:
+        name: 工具名（见 TOOL_PROBES）
+
+    Returns:
+        dict: {"path", "version", "capabilities"}，未安装时返回 None
+    """
+    if name in _TOOL_INFO:
+        return _TOOL_INFO[name]
+
+    path = shutil.which(name)
+    if not path:
+        _TOOL_INFO[name] = None
+        return None
+
+    key = f"{os.path.realpath(path)}|{os.stat(path).st_mtime_ns}|{shutil.which('latex')}"
+
+    cache = {}
+    if TOOL_CACHE_FILE.exists():
+        try:
+            with open(TOOL_CACHE_FILE, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            cache = {}
+
+    entry = cache.get(name)
+    if entry and entry.get("key") == key:
+        info = entry["info"]
+    else:
+        try:
+            info = TOOL_PROBES[name](path)
+        except (OSError, subprocess.TimeoutExpired):
+            info = None
+        if info is not None:
+            info["path"] = path
+            cache[name] = {"key": key, "info": info}
+            # 先写临时文件再替换，并发的批量工作进程不会读到半个文件
+            TOOL_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = TOOL_CACHE_FILE.with_name(f"{TOOL_CACHE_FILE.name}.{os.getpid()}.tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, TOOL_CACHE_FILE)
+
+    _TOOL_INFO[name] = info
+    return info
+
 
 def check_manim_installed():
     """检查 manim 是否已安装"""
-    try:
-        result = subprocess.run(
-            ["manim", "--version"],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        return result.returncode == 0
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        return False
+    return get_tool_info("manim") is not None
 
 
 def create_output_structure(scene_name: str, quality: str, description: str = "") -> Path:
@@ -92,8 +274,16 @@ def create_output_structure(scene_name: str, quality: str, description: str = ""
     timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
 
     # 创建输出目录: manim_outputs/<scene_name>_<timestamp>/
+    # 同一秒内的并发构建追加序号，避免共用目录
     output_dir = OUTPUT_BASE_DIR / f"{scene_name}_{timestamp}"
-    output_dir.mkdir(parents=True, exist_ok=True)
+    suffix = 1
+    while True:
+        try:
+            output_dir.mkdir(parents=True)
+            break
+        except FileExistsError:
+            suffix += 1
+            output_dir = OUTPUT_BASE_DIR / f"{scene_name}_{timestamp}_{suffix}"
 
     # 创建子目录
     (output_dir / "output" / quality).mkdir(parents=True, exist_ok=True)
@@ -137,18 +327,739 @@ def create_output_structure(scene_name: str, quality: str, description: str = ""
 
 def get_manim_version():
     """获取 manim 版本"""
+    info = get_tool_info("manim")
+    return info["version"] if info else "unknown"
+
+
+def compute_cache_key(scene_file: Path, scene_name: str, quality: str, manim_version: str) -> str:
+    """
+    计算渲染缓存键
+
+    注意: 只对场景文件本身取哈希，场景 import 的本地模块变化不会使缓存失效，
+    此时请使用 --no-cache。
+
+    Args:
+        scene_file: 场景文件路径
+        scene_name: 场景类名
+        quality: 质量级别
+        manim_version: manim 版本字符串
+
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    digest.update(scene_file.read_bytes())
+    for part in (scene_name, quality, manim_version):
+        digest.update(b"\0")
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _cache_entry_dir(cache_key: str) -> Path:
+    """缓存条目目录: .cache/renders/<前两位>/<key>/"""
+    return RENDER_CACHE_DIR / cache_key[:2] / cache_key
+
+
+def lookup_render_cache(cache_key: str) -> Path:
+    """
+    查找渲染缓存
+
+    Args:
+        cache_key: 缓存键
+
+    Returns:
+        Path: 缓存的视频文件路径，未命中则返回 None
+    """
+    entry_dir = _cache_entry_dir(cache_key)
+    meta_file = entry_dir / "meta.json"
+    if not meta_file.exists():
+        return None
+
     try:
-        result = subprocess.run(
-            ["manim", "--version"],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            return result.stdout.strip()
-    except:
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+    video_file = entry_dir / meta.get("video", "")
+    if not video_file.is_file():
+        return None
+
+    # 更新最近使用时间，供 LRU 淘汰使用
+    meta["last_used"] = time.time()
+    with open(meta_file, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    return video_file
+
+
+def store_render_cache(cache_key: str, video_file: Path, scene_name: str, quality: str):
+    """
+    将渲染结果写入缓存
+
+    Args:
+        cache_key: 缓存键
+        video_file: 渲染得到的视频文件
+        scene_name: 场景类名
+        quality: 质量级别
+    """
+    entry_dir = _cache_entry_dir(cache_key)
+    entry_dir.mkdir(parents=True, exist_ok=True)
+
+    cached_video = entry_dir / video_file.name
+    if cached_video.exists():
+        cached_video.unlink()
+    link_or_copy(video_file, cached_video, allow_symlink=False)
+
+    now = time.time()
+    meta = {
+        "scene_name": scene_name,
+        "quality": quality,
+        "video": cached_video.name,
+        "size": cached_video.stat().st_size,
+        "created_at": now,
+        "last_used": now
+    }
+    with open(entry_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+
+def link_or_copy(src: Path, dest: Path, allow_symlink: bool = True):
+    """
+    硬链接文件，失败时依次退回到符号链接和复制
+
+    Args:
+        src: 源文件
+        dest: 目标路径
+        allow_symlink: 是否允许使用符号链接（缓存内部必须是独立副本）
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dest)
+        return
+    except OSError:
         pass
-    return "unknown"
+    if allow_symlink:
+        try:
+            dest.symlink_to(src.resolve())
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dest)
+
+
+def evict_render_cache(max_bytes: int = CACHE_MAX_BYTES, max_age_days: float = CACHE_MAX_AGE_DAYS) -> int:
+    """
+    按年龄和总大小淘汰渲染缓存
+
+    先删除超过 max_age_days 未使用的条目，再按最近使用时间（LRU）
+    删除最旧的条目直到总大小不超过 max_bytes。
+
+    Args:
+        max_bytes: 缓存总大小上限（字节）
+        max_age_days: 最长保留天数
+
+    Returns:
+        int: 被删除的条目数
+    """
+    if not RENDER_CACHE_DIR.exists():
+        return 0
+
+    entries = []
+    for meta_file in RENDER_CACHE_DIR.glob("*/*/meta.json"):
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            entries.append((meta.get("last_used", 0), meta.get("size", 0), meta_file.parent))
+        except (OSError, json.JSONDecodeError):
+            # 损坏的条目直接删除
+            entries.append((0, 0, meta_file.parent))
+
+    entries.sort(key=lambda entry: entry[0])
+    total_bytes = sum(size for _, size, _ in entries)
+    cutoff = time.time() - max_age_days * 86400
+
+    removed = 0
+    for last_used, size, entry_dir in entries:
+        if last_used >= cutoff and total_bytes <= max_bytes:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total_bytes -= size
+        removed += 1
+
+    return removed
+
+
+def _count_loop_iterations(node: ast.AST) -> int:
+    """估算循环次数: for ... in range(<常量>) 取常量，其余按 5 次计"""
+    if isinstance(node, ast.For) and isinstance(node.iter, ast.Call):
+        func = node.iter.func
+        args = node.iter.args
+        if getattr(func, "id", "") == "range" and args and all(isinstance(a, ast.Constant) for a in args):
+            values = [a.value for a in args]
+            try:
+                return max(1, len(range(*values)))
+            except (TypeError, ValueError):
+                pass
+    return 5
+
+
+def _constant_seconds(node: ast.AST, default: float) -> float:
+    """数字常量转换为秒数，变量、字符串、None 等无法静态确定的值使用默认值"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    return default
+
+
+def estimate_animation_seconds(scene_file: str, scene_name: str) -> float:
+    """
+    静态估算场景的动画总时长（秒）
+
+    统计场景类中 self.play / self.wait 调用，取常量 run_time / duration，
+    缺省按 1 秒计；循环内的调用乘以估算的循环次数。
+
+    Args:
+        scene_file: Scene .py 文件路径
+        scene_name: 场景类名
+
+    Returns:
+        float: 估算的动画总时长，解析失败时返回 0
+    """
+    try:
+        tree = ast.parse(Path(scene_file).read_text(encoding="utf-8"))
+    except (OSError, SyntaxError):
+        return 0
+
+    scene_class = next(
+        (node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == scene_name),
+        None
+    )
+    if scene_class is None:
+        return 0
+
+    def visit(node: ast.AST, multiplier: int) -> float:
+        total = 0.0
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            owner = node.func.value
+            if getattr(owner, "id", "") == "self" and node.func.attr in ("play", "wait"):
+                seconds = 1.0
+                for keyword in node.keywords:
+                    if keyword.arg in ("run_time", "duration"):
+                        seconds = _constant_seconds(keyword.value, seconds)
+                if node.func.attr == "wait" and node.args:
+                    seconds = _constant_seconds(node.args[0], seconds)
+                total += seconds * multiplier
+        if isinstance(node, (ast.For, ast.While)):
+            multiplier *= _count_loop_iterations(node)
+        for child in ast.iter_child_nodes(node):
+            total += visit(child, multiplier)
+        return total
+
+    return visit(scene_class, 1)
+
+
+def estimate_render_timeout(scene_file: str, scene_name: str, quality: str) -> int:
+    """
+    按质量预设和动画数量估算渲染超时
+
+    timeout = 固定开销 + 帧数 × 每帧耗时 × 安全系数，且不低于 RENDER_TIMEOUT。
+
+    Args:
+        scene_file: Scene .py 文件路径
+        scene_name: 场景类名
+        quality: 质量级别
+
+    Returns:
+        int: 超时时间（秒）
+    """
+    quality_config = QUALITY_MAP[quality]
+    frames = estimate_animation_seconds(scene_file, scene_name) * quality_config["frame_rate"]
+    budget = TIMEOUT_BASE_SECONDS + frames * quality_config["seconds_per_frame"] * TIMEOUT_SAFETY_FACTOR
+    return max(RENDER_TIMEOUT, int(budget))
+
+
+def count_partial_movies(media_dir: Path, scene_name: str) -> int:
+    """统计 manim 已写出的片段文件数（partial_movie_files/<Scene>/*.mp4）"""
+    return sum(1 for _ in media_dir.glob(f"videos/*/*/partial_movie_files/{scene_name}/*.mp4"))
+
+
+def collect_rendered_video(media_dir: Path, manim_output_dir: Path, scene_name: str, quality: str) -> Path:
+    """
+    将 manim 在 media 目录中生成的视频链接到 output/<quality>/
+
+    Args:
+        media_dir: 传给 manim --media_dir 的目录
+        manim_output_dir: 输出目录下的 output/
+        scene_name: 场景类名
+        quality: 质量级别
+
+    Returns:
+        Path: output/ 下的视频路径，找不到则返回 None
+    """
+    for video in media_dir.glob(f"videos/*/*/{scene_name}.mp4"):
+        dest = manim_output_dir / QUALITY_MAP[quality]["name"] / video.name
+        if dest.exists():
+            dest.unlink()
+        link_or_copy(video, dest)
+        return dest
+    return None
+
+
+def get_partial_movie_dir(media_dir: Path, scene_file: Path, scene_name: str, quality: str) -> Path:
+    """manim 片段目录: media/videos/<模块名>/<分辨率帧率>/partial_movie_files/<Scene>/"""
+    return (
+        media_dir / "videos" / scene_file.stem / QUALITY_MAP[quality]["manim_dir"]
+        / "partial_movie_files" / scene_name
+    )
+
+
+def _segment_index_file(scene_file: Path, scene_name: str, quality: str) -> Path:
+    """记录某场景上一次构建用到的片段哈希"""
+    return SEGMENT_CACHE_DIR / "index" / f"{scene_file.stem}__{scene_name}__{quality}.json"
+
+
+def _segment_store_path(segment_name: str) -> Path:
+    return SEGMENT_CACHE_DIR / segment_name[:2] / segment_name
+
+
+def seed_segment_cache(partial_dir: Path, scene_file: Path, scene_name: str, quality: str) -> int:
+    """
+    把该场景上次构建的片段硬链接到新的片段目录
+
+    manim 渲染每个动画前会检查同名（同哈希）片段是否存在，存在则跳过，
+    因此只有发生变化的动画会被重新渲染，最后由 manim 统一拼接。
+
+    Args:
+        partial_dir: 本次构建的片段目录
+        scene_file: 场景文件路径
+        scene_name: 场景类名
+        quality: 质量级别
+
+    Returns:
+        int: 预置的片段数
+    """
+    index_file = _segment_index_file(scene_file, scene_name, quality)
+    if not index_file.exists():
+        return 0
+
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            segment_names = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return 0
+
+    seeded = 0
+    for segment_name in segment_names:
+        cached = _segment_store_path(segment_name)
+        dest = partial_dir / segment_name
+        if not cached.is_file() or dest.exists():
+            continue
+        link_or_copy(cached, dest, allow_symlink=False)
+        # 刷新修改时间，供 LRU 淘汰使用
+        os.utime(cached)
+        seeded += 1
+    return seeded
+
+
+def harvest_segment_cache(partial_dir: Path, scene_file: Path, scene_name: str, quality: str) -> int:
+    """
+    把本次构建的片段收入共享片段缓存，并更新该场景的片段索引
+
+    成功的构建以 manim 写出的 partial_movie_file_list.txt 为准（只记录实际用到的片段）；
+    失败或超时的构建收录目录中的全部片段，供下次续用。
+
+    Args:
+        partial_dir: 本次构建的片段目录
+        scene_file: 场景文件路径
+        scene_name: 场景类名
+        quality: 质量级别
+
+    Returns:
+        int: 新收录的片段数
+    """
+    if not partial_dir.is_dir():
+        return 0
+
+    list_file = partial_dir / "partial_movie_file_list.txt"
+    if list_file.exists():
+        # 每行形如: file 'file:/path/to/<hash>.mp4'
+        segments = [
+            Path(line.strip().rstrip("'").split("file:", 1)[-1])
+            for line in list_file.read_text(encoding="utf-8").splitlines()
+            if line.startswith("file ")
+        ]
+        segments = [partial_dir / segment.name for segment in segments]
+    else:
+        segments = sorted(partial_dir.glob("*.mp4"))
+
+    harvested = 0
+    names = []
+    for segment in segments:
+        if not segment.is_file():
+            continue
+        names.append(segment.name)
+        cached = _segment_store_path(segment.name)
+        if cached.exists():
+            continue
+        link_or_copy(segment, cached, allow_symlink=False)
+        harvested += 1
+
+    index_file = _segment_index_file(scene_file, scene_name, quality)
+    index_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(index_file, "w", encoding="utf-8") as f:
+        json.dump(names, f, indent=2)
+
+    return harvested
+
+
+def evict_segment_cache(max_bytes: int = SEGMENT_CACHE_MAX_BYTES, max_age_days: float = CACHE_MAX_AGE_DAYS) -> int:
+    """
+    按年龄和总大小（LRU，以修改时间计）淘汰片段缓存
+
+    Args:
+        max_bytes: 片段缓存总大小上限（字节）
+        max_age_days: 最长保留天数
+
+    Returns:
+        int: 被删除的片段数
+    """
+    if not SEGMENT_CACHE_DIR.exists():
+        return 0
+
+    segments = []
+    for segment in SEGMENT_CACHE_DIR.glob("*/*.mp4"):
+        stat = segment.stat()
+        segments.append((stat.st_mtime, stat.st_size, segment))
+
+    segments.sort(key=lambda entry: entry[0])
+    total_bytes = sum(size for _, size, _ in segments)
+    cutoff = time.time() - max_age_days * 86400
+
+    removed = 0
+    for mtime, size, segment in segments:
+        if mtime >= cutoff and total_bytes <= max_bytes:
+            break
+        segment.unlink(missing_ok=True)
+        total_bytes -= size
+        removed += 1
+
+    return removed
+
+
+@contextlib.contextmanager
+def locked_build_index():
+    """
+    独占读写构建索引（批量工作进程会并发登记构建）
+
+    索引结构:
+        builds: 构建目录名 → {scene_name, quality, success, video, size_bytes, created_at, last_used}
+        latest: "<场景>@<质量>" → 最近一次成功构建的目录名
+
+    Yields:
+        dict: 索引，退出上下文时写回
+    """
+    OUTPUT_BASE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(BUILD_INDEX_FILE.with_suffix(".lock"), "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        else:
+            # Windows: 锁定锁文件的第一个字节
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            index = _read_build_index()
+            yield index
+            tmp_file = BUILD_INDEX_FILE.with_suffix(".json.tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, BUILD_INDEX_FILE)
+        finally:
+            if fcntl is None:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_build_index() -> dict:
+    """读取构建索引（只读，不加锁；写入通过原子替换完成，不会读到半个文件）"""
+    index = {}
+    if BUILD_INDEX_FILE.exists():
+        try:
+            with open(BUILD_INDEX_FILE, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            index = {}
+    index.setdefault("builds", {})
+    index.setdefault("latest", {})
+    return index
+
+
+def _latest_key(scene_name: str, quality: str) -> str:
+    return f"{scene_name}@{quality}"
+
+
+def _dir_size(path: Path) -> int:
+    """目录总大小（字节），只在登记构建时计算一次"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_build_manifest(output_dir: Path) -> dict:
+    """读取 <output_dir>/manifest.json，不存在时返回空清单"""
+    manifest_file = Path(output_dir) / BUILD_MANIFEST_NAME
+    if not manifest_file.exists():
+        return {"artifacts": []}
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record_build_artifacts(output_dir: Path, artifacts: dict, **fields):
+    """
+    把产物写入构建清单 <output_dir>/manifest.json
+
+    每个产物记录相对构建目录的路径、大小和 sha256；目录类产物（PNG 序列）逐个文件记录，
+    但只记录大小，不计算 sha256（逐帧哈希的开销与帧数成正比）。同一格式再次导出时替换旧记录。
+
+    Args:
+        output_dir: 构建目录
+        artifacts: 格式 → 文件或目录路径
+        **fields: 清单的其他字段（如 scene_name、quality）
+    """
+    output_dir = Path(output_dir)
+    manifest = load_build_manifest(output_dir)
+    manifest.update(fields)
+    entries = [a for a in manifest.get("artifacts", []) if a["format"] not in artifacts]
+
+    for fmt, target in artifacts.items():
+        target = Path(target)
+        is_sequence = target.is_dir()
+        files = sorted(f for f in target.iterdir() if f.is_file()) if is_sequence else [target]
+        for file in files:
+            if not file.exists():
+                continue
+            entries.append({
+                "format": fmt,
+                "path": os.path.relpath(file, output_dir),
+                "bytes": file.stat().st_size,
+                "sha256": None if is_sequence else _file_sha256(file)
+            })
+
+    manifest["artifacts"] = entries
+    with open(output_dir / BUILD_MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+
+def register_build(output_dir: Path, metrics: dict = None):
+    """
+    在构建索引中登记（或更新）一个构建目录
+
+    只登记 OUTPUT_BASE_DIR 下的直接子目录，--output 指定的外部目录不受保留策略管理。
+    成功产出视频的构建成为该场景和质量的最新构建。
+
+    Args:
+        output_dir: 构建目录
+        metrics: 构建指标，省略时只刷新大小（如导出其他格式之后）
+    """
+    output_dir = Path(output_dir)
+    if output_dir.parent.resolve() != OUTPUT_BASE_DIR.resolve():
+        return
+
+    now = time.time()
+    with locked_build_index() as index:
+        record = index["builds"].get(output_dir.name, {"created_at": now})
+        if metrics is not None:
+            video = metrics.get("video")
+            record.update({
+                "scene_name": metrics.get("scene_name"),
+                "quality": metrics.get("quality"),
+                "success": metrics.get("success"),
+                "video": os.path.relpath(video, output_dir) if video else None
+            })
+            if record["success"] and video:
+                index["latest"][_latest_key(record["scene_name"], record["quality"])] = output_dir.name
+        record["size_bytes"] = _dir_size(output_dir)
+        record["last_used"] = now
+        index["builds"][output_dir.name] = record
+
+
+def touch_build(output_dir: Path):
+    """更新构建的最近使用时间（LRU）"""
+    output_dir = Path(output_dir)
+    with locked_build_index() as index:
+        if output_dir.name in index["builds"]:
+            index["builds"][output_dir.name]["last_used"] = time.time()
+
+
+def lookup_latest_build(scene_name: str, quality: str) -> dict:
+    """
+    查询某个场景在某个质量下最近一次成功的构建（只读索引，不遍历文件系统）
+
+    Args:
+        scene_name: 场景类名
+        quality: 质量级别
+
+    Returns:
+        dict: {"output_dir", "video", ...索引记录}，没有记录时返回 None
+    """
+    index = _read_build_index()
+    name = index["latest"].get(_latest_key(scene_name, quality))
+    record = index["builds"].get(name) if name else None
+    if not record:
+        return None
+
+    output_dir = OUTPUT_BASE_DIR / name
+    return {
+        **record,
+        "output_dir": output_dir,
+        "video": output_dir / record["video"] if record.get("video") else None
+    }
+
+
+def _refresh_latest(index: dict):
+    """按创建时间重新计算 latest 指针（淘汰或重建索引之后）"""
+    index["latest"] = {}
+    for name, record in sorted(index["builds"].items(), key=lambda item: item[1].get("created_at", 0)):
+        if record.get("success") and record.get("video"):
+            index["latest"][_latest_key(record["scene_name"], record["quality"])] = name
+
+
+def load_retention_config() -> dict:
+    """读取保留策略配置，缺省项使用默认值"""
+    config = {"max_bytes": RETENTION_MAX_BYTES, "max_age_days": RETENTION_MAX_AGE_DAYS, "pinned": []}
+    if RETENTION_CONFIG_FILE.exists():
+        with open(RETENTION_CONFIG_FILE, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+
+def save_retention_config(config: dict):
+    OUTPUT_BASE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(RETENTION_CONFIG_FILE, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+
+
+def set_build_pinned(pattern: str, pinned: bool = True):
+    """
+    固定 / 取消固定构建目录（支持通配符，如 "Intro_*"）
+
+    Args:
+        pattern: 构建目录名或通配符
+        pinned: True 固定，False 取消固定
+    """
+    config = load_retention_config()
+    patterns = [p for p in config.get("pinned", []) if p != pattern]
+    if pinned:
+        patterns.append(pattern)
+    config["pinned"] = patterns
+    save_retention_config(config)
+
+
+def is_build_pinned(name: str, patterns: list) -> bool:
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def enforce_retention(dry_run: bool = False, keep: set = None) -> list:
+    """
+    按保留策略淘汰整个构建目录
+
+    只读取构建索引，不遍历目录: 先删除超过 max_age_days 未使用的构建，
+    再按最近使用时间（LRU）删除最旧的构建直到总大小不超过 max_bytes。
+    固定的构建（retention.json 的 pinned 通配符）永不删除。
+
+    Args:
+        dry_run: 只返回将被删除的目录，不实际删除
+        keep: 本次不得删除的目录名（如刚完成的构建）
+
+    Returns:
+        list[str]: 被删除（或将被删除）的构建目录名
+    """
+    config = load_retention_config()
+    max_bytes = config.get("max_bytes")
+    max_age_days = config.get("max_age_days")
+    patterns = config.get("pinned", [])
+    keep = keep or set()
+
+    removed = []
+    with locked_build_index() as index:
+        builds = index["builds"]
+        total_bytes = sum(record.get("size_bytes", 0) for record in builds.values())
+        cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+
+        candidates = sorted(
+            (name for name in builds if name not in keep and not is_build_pinned(name, patterns)),
+            key=lambda name: builds[name].get("last_used", 0)
+        )
+        for name in candidates:
+            record = builds[name]
+            expired = cutoff is not None and record.get("last_used", 0) < cutoff
+            over_quota = max_bytes is not None and total_bytes > max_bytes
+            if not expired and not over_quota:
+                break
+            removed.append(name)
+            total_bytes -= record.get("size_bytes", 0)
+            if not dry_run:
+                shutil.rmtree(OUTPUT_BASE_DIR / name, ignore_errors=True)
+                del builds[name]
+
+        if removed and not dry_run:
+            _refresh_latest(index)
+
+    return removed
+
+
+def rebuild_build_index() -> int:
+    """
+    扫描 OUTPUT_BASE_DIR 的直接子目录重建索引（用于旧版本产生的目录或索引损坏时）
+
+    Returns:
+        int: 登记的构建数
+    """
+    if not OUTPUT_BASE_DIR.exists():
+        return 0
+
+    with locked_build_index() as index:
+        builds = index["builds"] = {}
+        for output_dir in OUTPUT_BASE_DIR.iterdir():
+            config_file = output_dir / "config.json"
+            if output_dir.name.startswith(".") or not config_file.exists():
+                continue
+            with open(config_file, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            scene_name, quality = config.get("scene_name"), config.get("quality")
+            video = find_output_video(output_dir, scene_name, quality) if quality in QUALITY_MAP else None
+            mtime = output_dir.stat().st_mtime
+            builds[output_dir.name] = {
+                "created_at": mtime,
+                "scene_name": scene_name,
+                "quality": quality,
+                "success": video is not None,
+                "video": os.path.relpath(video, output_dir) if video else None,
+                "size_bytes": _dir_size(output_dir),
+                "last_used": mtime
+            }
+        _refresh_latest(index)
+        return len(builds)
+
+
+def list_builds() -> list:
+    """从构建索引列出构建（按创建时间倒序）"""
+    return sorted(
+        ({"name": name, **record} for name, record in _read_build_index()["builds"].items()),
+        key=lambda record: record.get("created_at", 0),
+        reverse=True
+    )
 
 
 def copy_scene_file(scene_file: Path, output_dir: Path):
@@ -163,7 +1074,12 @@ def build_scene(
     scene_name: str = "Scene",
     quality: str = "high",
     description: str = "",
-    custom_output_dir: str = None
+    custom_output_dir: str = None,
+    use_cache: bool = True,
+    progress_callback: callable = None,
+    timeout: int = None,
+    max_resumes: int = MAX_RESUMES,
+    engine: str = "cli"
 ) -> tuple[bool, Path]:
     """
     编译 Manim 场景
@@ -174,11 +1090,24 @@ def build_scene(
         quality: 渲染质量
         description: 场景描述
         custom_output_dir: 自定义输出目录（覆盖默认行为）
+        use_cache: 是否使用渲染缓存
+        progress_callback: 进度回调，接收进度事件 dict（同时写入 logs/progress.jsonl）
+        timeout: 单次渲染超时（秒），默认按质量和动画数量估算
+        max_resumes: 超时或崩溃后从已渲染片段继续的最大次数
+        engine: 渲染引擎（cli / inprocess / worker，见 ENGINE_CHOICES）
 
     Returns:
         (success, output_dir): 是否成功和输出目录路径
     """
     scene_path = Path(scene_file)
+    started = phase_started = time.time()
+    phases = {}
+
+    def end_phase(name: str):
+        nonlocal phase_started
+        now = time.time()
+        phases[name] = round(phases.get(name, 0) + now - phase_started, 3)
+        phase_started = now
 
     # 检查文件是否存在
     if not scene_path.exists():
@@ -197,162 +1126,1151 @@ def build_scene(
         print(f"   可选: {', '.join(QUALITY_MAP.keys())}")
         return False, None
 
+    end_phase("probe")
+
     # 创建输出目录结构
     if custom_output_dir:
         output_dir = Path(custom_output_dir)
+        (output_dir / "logs").mkdir(parents=True, exist_ok=True)
     else:
         output_dir = create_output_structure(scene_name, quality, description)
 
     # 复制场景文件
     copy_scene_file(scene_path, output_dir)
+    end_phase("copy")
 
     quality_config = QUALITY_MAP[quality]
     quality_flag = quality_config["flag"]
-
-    # 构建 manim 命令，输出到指定目录
     manim_output_dir = output_dir / "output"
-    cmd = ["manim", quality_flag, "-o", str(manim_output_dir), str(scene_path), scene_name]
+
+    metrics = {
+        "scene_name": scene_name,
+        "scene_file": str(scene_path),
+        "quality": quality,
+        "engine": engine,
+        "cache_hit": False,
+        "started_at": datetime.fromtimestamp(started).isoformat(),
+        "phases": phases
+    }
+
+    def finish(success: bool, video_file: Path = None) -> tuple[bool, Path]:
+        metrics["success"] = success
+        metrics["wall_time"] = round(time.time() - started, 3)
+        if video_file and video_file.exists():
+            metrics["video"] = str(video_file)
+            metrics["output_bytes"] = video_file.stat().st_size
+            record_build_artifacts(output_dir, {"mp4": video_file}, scene_name=scene_name, quality=quality)
+        write_build_metrics(output_dir, metrics)
+        return success, output_dir
+
+    # 查询渲染缓存
+    cache_key = None
+    if use_cache:
+        cache_key = compute_cache_key(scene_path, scene_name, quality, get_manim_version())
+        cached_video = lookup_render_cache(cache_key)
+        end_phase("cache_lookup")
+        if cached_video:
+            video_file = manim_output_dir / quality_config["name"] / cached_video.name
+            link_or_copy(cached_video, video_file)
+            with open(output_dir / "logs" / "build.log", "w", encoding="utf-8") as f:
+                f.write(f"Cache hit: {cache_key}\n")
+                f.write(f"Source: {cached_video}\n")
+            print(f"⚡ 命中渲染缓存: {cache_key[:12]}")
+            print(f"\n📺 视频文件: {video_file}")
+            print(f"📂 完整输出: {output_dir}")
+            metrics["cache_hit"] = True
+            end_phase("copy")
+            return finish(True, video_file)
+
+    # 构建 manim 命令: media 目录固定在输出目录内，超时或崩溃后可从已渲染片段继续
+    media_dir = output_dir / "media"
+    cmd = ["manim", quality_flag, "--media_dir", str(media_dir), str(scene_path), scene_name]
+
+    if timeout is None:
+        timeout = estimate_render_timeout(str(scene_path), scene_name, quality)
 
     print(f"🎬 编译场景: {scene_name}")
     print(f"📁 输出目录: {output_dir}")
     print(f"🎨 质量: {quality} ({quality_config['resolution']})")
+    print(f"⏱️  超时: {timeout} 秒")
     print("-" * 50)
 
-    try:
-        # 运行 manim 命令
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 分钟超时
-        )
+    log_file = output_dir / "logs" / "build.log"
+    progress_file = output_dir / "logs" / "progress.jsonl"
+
+    def on_progress(event: dict):
+        with open(progress_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        if progress_callback:
+            progress_callback(event)
+
+    # 预置上次构建的动画片段，只重新渲染发生变化的动画
+    partial_dir = get_partial_movie_dir(media_dir, scene_path, scene_name, quality)
+    if use_cache:
+        partial_dir.mkdir(parents=True, exist_ok=True)
+        seeded = seed_segment_cache(partial_dir, scene_path, scene_name, quality)
+        metrics["segments_reused"] = seeded
+        if seeded:
+            print(f"⚡ 复用 {seeded} 个已缓存的动画片段")
+    end_phase("segment_cache")
 
-        # 保存编译日志
-        log_file = output_dir / "logs" / "build.log"
-        with open(log_file, "w", encoding="utf-8") as f:
-            f.write(f"Command: {' '.join(cmd)}\n\n")
-            f.write(f"STDOUT:\n{result.stdout}\n\n")
-            f.write(f"STDERR:\n{result.stderr}\n")
+    try:
+        # manim 会跳过已有片段文件的动画，因此重跑即是续渲染；
+        # 只有上一次确实产出了新片段才继续，避免对代码错误反复重试
+        partials = count_partial_movies(media_dir, scene_name)
+        resumes = 0
+        stats = {}
+        while True:
+            if engine == "cli":
+                returncode, tail, timed_out = run_manim(
+                    cmd, log_file, timeout, on_progress, append=log_file.exists(), stats=stats
+                )
+            else:
+                returncode, tail, timed_out = run_engine(
+                    engine, scene_path, scene_name, quality, media_dir, log_file, timeout, on_progress
+                )
+            if returncode == 0 or resumes >= max_resumes:
+                break
+            rendered = count_partial_movies(media_dir, scene_name)
+            if rendered <= partials:
+                break
+            partials = rendered
+            resumes += 1
+            reason = "超时" if timed_out else "中断"
+            print(f"🔁 编译{reason}，从 {rendered} 个已渲染片段继续（第 {resumes}/{max_resumes} 次）")
+
+        end_phase("manim")
+        metrics["resumes"] = resumes
+        metrics.update(summarize_render_stats(stats, phases.pop("manim")))
+        phases.update(metrics.pop("render_phases"))
+
+        if use_cache:
+            harvest_segment_cache(partial_dir, scene_path, scene_name, quality)
+            evict_segment_cache()
+        end_phase("segment_cache")
+
+        if returncode != 0 and timed_out:
+            print(f"❌ 错误: 编译超时（超过 {timeout} 秒）")
+            print("   建议: 使用较低质量或简化场景")
+            print(f"   续渲染: python build.py {scene_file} --scene {scene_name} --quality {quality} --resume {output_dir}")
+            print(f"\n📋 查看日志: {log_file}")
+            metrics["timed_out"] = True
+            return finish(False)
 
-        if result.returncode == 0:
+        if returncode == 0:
             print("✅ 编译成功!")
 
             # 查找生成的视频文件
-            video_file = find_output_video(manim_output_dir, scene_name, quality)
+            video_file = collect_rendered_video(media_dir, manim_output_dir, scene_name, quality)
+            if video_file is None:
+                video_file = find_output_video(output_dir, scene_name, quality)
             if video_file:
+                if cache_key:
+                    store_render_cache(cache_key, video_file, scene_name, quality)
+                    evict_render_cache()
+                end_phase("collect")
                 print(f"\n📺 视频文件: {video_file}")
                 print(f"📂 完整输出: {output_dir}")
-                return True, output_dir
+                return finish(True, video_file)
             else:
                 print("⚠️  编译成功但未找到视频文件")
-                return True, output_dir
+                return finish(True)
         else:
             print("❌ 编译失败!")
-            print(result.stderr)
+            print("\n".join(tail))
             print(f"\n📋 查看日志: {log_file}")
-            return False, output_dir
+            return finish(False)
 
-    except subprocess.TimeoutExpired:
-        print("❌ 错误: 编译超时（超过 5 分钟）")
-        print("   建议: 使用较低质量或简化场景")
-        return False, output_dir
     except Exception as e:
         print(f"❌ 错误: {e}")
-        return False, output_dir
+        metrics["error"] = str(e)
+        return finish(False)
+
+
+def summarize_render_stats(stats: dict, manim_seconds: float) -> dict:
+    """
+    把 run_manim 采集的时间点拆分为渲染阶段
+
+    manim 的 construct 与逐帧渲染交错进行，无法完全分开；这里按输出划分:
+        startup: 进程启动到第一个动画进度（解释器启动、import manim、construct 开头）
+        render:  第一个动画进度到最后一个片段写出（逐帧渲染）
+        encode:  最后一个片段写出到进程退出（拼接片段、封装视频）
+    没有进度事件（非 cli 引擎或全部片段命中缓存）时整段计入 render。
+
+    Args:
+        stats: run_manim 填充的统计信息
+        manim_seconds: manim 运行总耗时
+
+    Returns:
+        dict: render_phases、frames、frames_per_second、peak_rss_bytes
+    """
+    summary = {"render_phases": {"render": manim_seconds}}
+    first, last, start, end = (stats.get(k) for k in ("first_progress", "last_segment", "start", "end"))
+    if first and last and start and end and start <= first <= last <= end:
+        summary["render_phases"] = {
+            "startup": round(first - start, 3),
+            "render": round(last - first, 3),
+            "encode": round(end - last, 3)
+        }
+
+    frames = sum(stats.get("frames", {}).values())
+    summary["frames"] = frames
+    render_seconds = summary["render_phases"]["render"]
+    summary["frames_per_second"] = round(frames / render_seconds, 2) if frames and render_seconds else None
+    summary["peak_rss_bytes"] = stats.get("peak_rss_bytes")
+    return summary
+
+
+def write_build_metrics(output_dir: Path, metrics: dict):
+    """
+    写入 <output_dir>/metrics.json 并追加到全局历史，同时登记构建
+
+    保留策略只通过 --gc 显式执行: 构建结束时自动清理可能删除并发的批量 / 守护进程构建
+    正在写入或提供的目录。
+    """
+    with open(output_dir / "metrics.json", "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2, ensure_ascii=False)
+    _append_metrics_history({"kind": "build", "output_dir": str(output_dir), **metrics})
+
+    register_build(output_dir, metrics)
+
+
+def update_build_metrics(output_dir: Path, phase: str, seconds: float, **fields):
+    """
+    把后处理阶段（如格式导出）的耗时合并进 metrics.json，并在历史中追加一条记录
+
+    Args:
+        output_dir: 输出目录
+        phase: 阶段名
+        seconds: 耗时（秒）
+        **fields: 其他字段
+    """
+    metrics_file = output_dir / "metrics.json"
+    metrics = {}
+    if metrics_file.exists():
+        with open(metrics_file, "r", encoding="utf-8") as f:
+            metrics = json.load(f)
+    metrics.setdefault("phases", {})[phase] = round(seconds, 3)
+    metrics.update(fields)
+    with open(metrics_file, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2, ensure_ascii=False)
+    _append_metrics_history({
+        "kind": phase,
+        "output_dir": str(output_dir),
+        "scene_name": metrics.get("scene_name"),
+        "quality": metrics.get("quality"),
+        "seconds": round(seconds, 3),
+        **fields
+    })
+
+
+def _append_metrics_history(record: dict):
+    """追加一行到全局指标历史（单次 write 追加，多进程并发写入不会交错）"""
+    record = {"recorded_at": datetime.now().isoformat(), **record}
+    METRICS_HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(METRICS_HISTORY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# 当前进程共用的常驻工作进程（engine="worker" 时按需启动）
+_RENDER_WORKER = None
+
+
+def run_engine(
+    engine: str,
+    scene_path: Path,
+    scene_name: str,
+    quality: str,
+    media_dir: Path,
+    log_file: Path,
+    timeout: float,
+    progress_callback: callable = None
+) -> tuple[int, list, bool]:
+    """
+    使用进程内引擎或常驻工作进程渲染，返回值与 run_manim 一致
+
+    inprocess 模式无法强制超时（渲染在当前进程中进行）；worker 模式超时后终止工作进程。
+
+    Args:
+        engine: inprocess 或 worker
+        scene_path: 场景文件路径
+        scene_name: 场景类名
+        quality: 质量级别
+        media_dir: manim media 目录
+        log_file: 日志文件路径
+        timeout: 超时时间（秒）
+        progress_callback: 进度回调
+
+    Returns:
+        (returncode, tail, timed_out): 退出码、日志尾部行和是否超时
+    """
+    global _RENDER_WORKER
+    from engine import RenderWorker, render_in_process
+
+    def emit(event: dict):
+        if progress_callback:
+            event["time"] = round(time.time(), 3)
+            progress_callback(event)
+
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, "a", encoding="utf-8") as log:
+        log.write(f"Engine: {engine} ({scene_path} {scene_name} {quality})\n\n")
+
+    manim_quality = QUALITY_MAP[quality]["manim_quality"]
+    emit({"event": "start", "engine": engine})
+    if engine == "worker":
+        if _RENDER_WORKER is None:
+            _RENDER_WORKER = RenderWorker()
+        result = _RENDER_WORKER.render(
+            str(scene_path), scene_name, manim_quality, str(media_dir), str(log_file), timeout
+        )
+    else:
+        result = render_in_process(str(scene_path), scene_name, manim_quality, str(media_dir), str(log_file))
+
+    returncode = 0 if result["success"] else 1
+    tail = result.get("error", "").splitlines()[-LOG_TAIL_LINES:]
+    with open(log_file, "a", encoding="utf-8") as log:
+        if tail:
+            log.write("\n".join(tail) + "\n")
+        log.write(f"\nExit code: {returncode}\n")
+
+    timed_out = result.get("timed_out", False)
+    emit({"event": "exit", "returncode": returncode, "timed_out": timed_out})
+    return returncode, tail, timed_out
+
+
+def run_manim(
+    cmd: list,
+    log_file: Path,
+    timeout: float,
+    progress_callback: callable = None,
+    append: bool = False,
+    stats: dict = None
+) -> tuple[int, list, bool]:
+    """
+    流式运行 manim 子进程
+
+    stdout/stderr 合并后逐行写入日志文件，同时解析进度条生成进度事件。
+    内存中只保留最后 LOG_TAIL_LINES 行，与渲染时长无关。
+
+    Args:
+        cmd: manim 命令
+        log_file: 日志文件路径
+        timeout: 超时时间（秒）
+        progress_callback: 进度回调，接收事件 dict
+        append: 追加到已有日志（续渲染时使用）
+        stats: 可选，填充计时和资源统计（start / first_progress / last_segment / end 时间点、
+            每个动画的帧数 frames、子进程峰值内存 peak_rss_bytes），续渲染时跨次累积
+
+    Returns:
+        (returncode, tail, timed_out): 退出码、日志尾部行和是否超时
+    """
+    tail = deque(maxlen=LOG_TAIL_LINES)
+    last_percent = {}
+    if stats is None:
+        stats = {}
+    stats.setdefault("start", time.time())
+    frames_by_animation = stats.setdefault("frames", {})
+
+    def emit(event: dict):
+        if progress_callback:
+            event["time"] = round(time.time(), 3)
+            progress_callback(event)
+
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, "a" if append else "w", encoding="utf-8") as log:
+        log.write(f"Command: {' '.join(cmd)}\n\n")
+
+        # 文本模式会把进度条的 \r 转换为换行，每次刷新都能读到一行
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1
+        )
+
+        timed_out = threading.Event()
+
+        def kill_on_timeout():
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(timeout, kill_on_timeout)
+        watchdog.daemon = True
+        watchdog.start()
+
+        emit({"event": "start", "pid": process.pid})
+        try:
+            for line in process.stdout:
+                line = line.rstrip("\n")
+                if not line.strip():
+                    continue
+
+                match = PROGRESS_PATTERN.search(line)
+                if match:
+                    index, name, percent, frame, frames = match.groups()
+                    index, percent = int(index), int(percent)
+                    # 同一百分比的重复刷新既不写日志也不上报
+                    if last_percent.get(index) == percent:
+                        continue
+                    last_percent[index] = percent
+                    stats.setdefault("first_progress", time.time())
+                    frames_by_animation[index] = int(frames)
+                    emit({
+                        "event": "progress",
+                        "animation": index,
+                        "name": name.strip(),
+                        "percent": percent,
+                        "frame": int(frame),
+                        "frames": int(frames)
+                    })
+                else:
+                    match = PARTIAL_DONE_PATTERN.search(line)
+                    if match:
+                        stats["last_segment"] = time.time()
+                        emit({"event": "animation_done", "animation": int(match.group(1))})
+
+                log.write(line + "\n")
+                tail.append(line)
+
+            if hasattr(os, "wait4"):
+                # wait4 同时取得该子进程的资源占用（峰值内存）
+                _, status, usage = os.wait4(process.pid, 0)
+                process.returncode = os.waitstatus_to_exitcode(status)
+                # ru_maxrss: Linux 单位为 KB，macOS 为字节
+                peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+                stats["peak_rss_bytes"] = max(stats.get("peak_rss_bytes") or 0, peak_rss)
+            else:
+                # Windows 没有 wait4，不统计峰值内存
+                process.wait()
+        finally:
+            watchdog.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        log.write(f"\nExit code: {process.returncode}\n")
+
+    stats["end"] = time.time()
+    emit({"event": "exit", "returncode": process.returncode, "timed_out": timed_out.is_set()})
+    return process.returncode, list(tail), timed_out.is_set()
 
 
 def find_output_video(output_dir: Path, scene_name: str, quality: str) -> Path:
     """
-    查找输出的视频文件
+    查找构建输出的视频文件
+
+    优先读取构建清单（manifest.json）中记录的 MP4；旧版本的构建没有清单时，
+    只检查 output/<分辨率>/ 下的固定文件名，不做递归查找。
 
     Args:
-        output_dir: Manim 输出目录
+        output_dir: 构建目录
         scene_name: 场景名称
         quality: 质量级别
 
     Returns:
         Path: 视频文件路径，如果找不到则返回 None
     """
-    quality_name = QUALITY_MAP[quality]["name"]
+    output_dir = Path(output_dir)
+    for artifact in load_build_manifest(output_dir).get("artifacts", []):
+        if artifact["format"] == "mp4":
+            video_path = output_dir / artifact["path"]
+            if video_path.exists():
+                return video_path
 
-    # 可能的视频文件路径
-    possible_names = [
-        f"{scene_name}.mp4",
-        f"{scene_name.capitalize()}.mp4",
-    ]
-
-    for name in possible_names:
-        video_path = output_dir / quality_name / name
+    quality_name = QUALITY_MAP[quality]["name"]
+    for name in (f"{scene_name}.mp4", f"{scene_name.capitalize()}.mp4"):
+        video_path = output_dir / "output" / quality_name / name
         if video_path.exists():
             return video_path
 
-        # 也检查直接在 output 目录下
-        video_path = output_dir / name
-        if video_path.exists():
-            return video_path
+    return None
 
-    # 递归查找所有 .mp4 文件
-    mp4_files = list(output_dir.glob("**/*.mp4"))
-    if mp4_files:
-        return mp4_files[0]
 
-    return None
+def build_gif_filter(fps: int, scale: float) -> str:
+    """
+    单一滤镜图完成 palettegen + paletteuse，只解码一次输入
 
+    Args:
+        fps: 帧率
+        scale: 缩放比例
 
-def export_to_gif(input_mp4: str, output_dir: Path, fps: int = 30, scale: float = 1.0):
+    Returns:
+        str: ffmpeg -filter_complex 参数
     """
-    将 MP4 转换为 GIF
+    return (
+        f"fps={fps},scale=trunc(iw*{scale}/2)*2:-2:flags=lanczos,split[a][b];"
+        f"[a]palettegen=stats_mode=diff[p];"
+        f"[b][p]paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle"
+    )
+
+
+def _encode_gif(input_mp4: str, output_gif: Path, fps: int, scale: float, start: float = None, end: float = None) -> tuple[bool, str]:
+    """执行一次 GIF 编码，返回 (是否成功, stderr)"""
+    cmd = ["ffmpeg", "-nostdin", "-v", "error"]
+    # -ss/-to 放在 -i 之前: 直接 seek，不解码区间外的帧
+    if start is not None:
+        cmd += ["-ss", str(start)]
+    if end is not None:
+        cmd += ["-to", str(end)]
+    cmd += ["-i", input_mp4, "-filter_complex", build_gif_filter(fps, scale), "-y", str(output_gif)]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+    return result.returncode == 0, result.stderr
+
+
+def export_to_gif(
+    input_mp4: str,
+    output_dir: Path,
+    fps: int = GIF_FPS,
+    scale: float = 1.0,
+    start: float = None,
+    end: float = None,
+    max_bytes: int = None
+):
+    """
+    将 MP4 转换为 GIF（调色板优化）
+
+    指定 max_bytes 时在 [0.1, scale] 区间二分搜索缩放比例，取不超过预算的最大尺寸；
+    最小尺寸仍超出预算时减半帧率（不低于 5 fps）后重试。
 
     Args:
         input_mp4: 输入 MP4 文件路径
         output_dir: 输出目录
         fps: 帧率
-        scale: 缩放比例
+        scale: 缩放比例（上限）
+        start: 起始时间（秒）
+        end: 结束时间（秒）
+        max_bytes: GIF 大小预算（字节）
     """
     if not Path(input_mp4).exists():
         print(f"❌ 错误: 找不到文件 '{input_mp4}'")
         return False
 
     output_gif = output_dir / "thumbnails" / Path(input_mp4).with_suffix(".gif").name
+    output_gif.parent.mkdir(parents=True, exist_ok=True)
 
     # 检查 ffmpeg 是否可用
-    try:
-        subprocess.run(
-            ["ffmpeg", "-version"],
-            capture_output=True,
-            timeout=5
-        )
-    except (FileNotFoundError, subprocess.TimeoutExpired):
+    if get_tool_info("ffmpeg") is None:
         print("❌ 错误: ffmpeg 未安装")
         print("   安装: sudo apt-get install ffmpeg")
         return False
 
-    # 构建 ffmpeg 命令
-    scale_filter = f"scale=iw*{scale}:ih*{scale}"
-    cmd = [
-        "ffmpeg", "-i", input_mp4,
-        "-vf", f"{scale_filter},fps={fps}",
-        "-y", str(output_gif)
-    ]
-
     try:
         print(f"🎞️  转换为 GIF: {output_gif}")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-
-        if result.returncode == 0:
-            print("✅ 转换成功!")
-            print(f"📁 GIF 文件: {output_gif}")
-            return True
-        else:
+        success, stderr = _encode_gif(input_mp4, output_gif, fps, scale, start, end)
+        if not success:
             print("❌ 转换失败!")
-            print(result.stderr)
+            print(stderr)
             return False
 
+        if max_bytes and output_gif.stat().st_size > max_bytes:
+            # 每次尝试写入临时文件，保留预算内尺寸最大的一次
+            attempt_gif = output_gif.with_suffix(".try.gif")
+            best_gif = output_gif.with_suffix(".best.gif")
+            best_scale = None
+            while best_scale is None:
+                low, high = 0.1, scale
+                for _ in range(6):
+                    mid = round((low + high) / 2, 3)
+                    success, stderr = _encode_gif(input_mp4, attempt_gif, fps, mid, start, end)
+                    if not success:
+                        break
+                    if attempt_gif.stat().st_size <= max_bytes:
+                        os.replace(attempt_gif, best_gif)
+                        best_scale = low = mid
+                    else:
+                        high = mid
+                if best_scale is None:
+                    success, stderr = _encode_gif(input_mp4, attempt_gif, fps, low, start, end)
+                    if success and attempt_gif.stat().st_size <= max_bytes:
+                        os.replace(attempt_gif, best_gif)
+                        best_scale = low
+                if best_scale is not None or fps <= 5:
+                    break
+                fps = max(5, fps // 2)
+
+            attempt_gif.unlink(missing_ok=True)
+            if best_scale is not None:
+                os.replace(best_gif, output_gif)
+                print(f"📐 按大小预算调整: scale={best_scale}, fps={fps}")
+            else:
+                print(f"⚠️  无法压缩到 {max_bytes} 字节以内，保留原始尺寸结果")
+
+        print("✅ 转换成功!")
+        print(f"📁 GIF 文件: {output_gif} ({output_gif.stat().st_size} 字节)")
+        return True
+
     except subprocess.TimeoutExpired:
         print("❌ 错误: 转换超时")
         return False
 
 
+def probe_duration(input_mp4: str) -> float:
+    """用 ffprobe 获取视频时长（秒），失败时返回 None"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", input_mp4],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        return float(result.stdout.strip())
+    except (FileNotFoundError, subprocess.TimeoutExpired, ValueError):
+        return None
+
+
+def export_formats(input_mp4: str, output_dir: Path, formats: list, gif_options: dict = None) -> dict:
+    """
+    一次解码，同时输出多种格式，并把导出耗时和产物大小记入 metrics.json
+
+    Args:
+        input_mp4: 渲染得到的 MP4
+        output_dir: 输出目录
+        formats: 需要的格式列表（mp4 会被忽略）
+        gif_options: GIF 参数（fps、scale、start、end、max_bytes）
+
+    Returns:
+        dict: 格式 → 输出路径，失败的格式不出现在结果中
+    """
+    started = time.time()
+    results = _export_formats(input_mp4, output_dir, formats, gif_options)
+
+    export_bytes = {}
+    for fmt, target in results.items():
+        if target.is_dir():
+            export_bytes[fmt] = sum(f.stat().st_size for f in target.iterdir() if f.is_file())
+        elif target.exists():
+            export_bytes[fmt] = target.stat().st_size
+    update_build_metrics(output_dir, "export", time.time() - started, export_bytes=export_bytes)
+    record_build_artifacts(output_dir, results)
+    register_build(output_dir)
+    return results
+
+
+def _export_formats(input_mp4: str, output_dir: Path, formats: list, gif_options: dict = None) -> dict:
+    """
+    一次解码，同时输出多种格式
+
+    用 split 把解码后的视频流分发到各个分支，每个分支对应一个输出:
+        gif    → thumbnails/<Scene>.gif（调色板优化）
+        webm   → 与 MP4 同目录的 <Scene>.webm（VP9）
+        png    → frames/<Scene>_0001.png ...
+        sprite → thumbnails/<Scene>_sprite.png（均匀采样的缩略图拼图）
+
+    GIF 指定了 max_bytes 时需要多次编码搜索尺寸，单独交给 export_to_gif。
+
+    Args:
+        input_mp4: 渲染得到的 MP4
+        output_dir: 输出目录
+        formats: 需要的格式列表（mp4 会被忽略）
+        gif_options: GIF 参数（fps、scale、start、end、max_bytes）
+
+    Returns:
+        dict: 格式 → 输出路径，失败的格式不出现在结果中
+    """
+    gif_options = dict(gif_options or {})
+    input_path = Path(input_mp4)
+    stem = input_path.stem
+    results = {}
+
+    branches = [fmt for fmt in formats if fmt != "mp4"]
+    if gif_options.get("max_bytes") and "gif" in branches:
+        branches.remove("gif")
+        if export_to_gif(input_mp4, output_dir, **gif_options):
+            results["gif"] = output_dir / "thumbnails" / f"{stem}.gif"
+    if not branches:
+        return results
+
+    if not input_path.exists():
+        print(f"❌ 错误: 找不到文件 '{input_mp4}'")
+        return results
+
+    ffmpeg_info = get_tool_info("ffmpeg")
+    if ffmpeg_info is None:
+        print("❌ 错误: ffmpeg 未安装")
+        print("   安装: sudo apt-get install ffmpeg")
+        return results
+    if "webm" in branches and "libvpx-vp9" not in ffmpeg_info["capabilities"]["encoders"]:
+        print("⚠️  当前 ffmpeg 不支持 libvpx-vp9，跳过 webm")
+        branches.remove("webm")
+        if not branches:
+            return results
+
+    labels = "".join(f"[v{i}]" for i in range(len(branches)))
+    graph = [f"[0:v]split={len(branches)}{labels}"]
+    outputs = []
+    targets = {}
+
+    for i, fmt in enumerate(branches):
+        if fmt == "gif":
+            fps = gif_options.get("fps") or GIF_FPS
+            scale = gif_options.get("scale") or 1.0
+            trim = ""
+            if gif_options.get("start") is not None or gif_options.get("end") is not None:
+                bounds = []
+                if gif_options.get("start") is not None:
+                    bounds.append(f"start={gif_options['start']}")
+                if gif_options.get("end") is not None:
+                    bounds.append(f"end={gif_options['end']}")
+                trim = f"trim={':'.join(bounds)},setpts=PTS-STARTPTS,"
+            graph.append(f"[v{i}]{trim}{build_gif_filter(fps, scale)}[gif]")
+            target = output_dir / "thumbnails" / f"{stem}.gif"
+            outputs += ["-map", "[gif]", str(target)]
+        elif fmt == "webm":
+            graph.append(f"[v{i}]null[webm]")
+            target = input_path.with_suffix(".webm")
+            outputs += [
+                "-map", "[webm]", "-c:v", "libvpx-vp9", "-crf", "32", "-b:v", "0",
+                "-row-mt", "1", "-deadline", "good", "-cpu-used", "4", str(target)
+            ]
+        elif fmt == "png":
+            graph.append(f"[v{i}]null[png]")
+            target = output_dir / "frames" / f"{stem}_%04d.png"
+            outputs += ["-map", "[png]", str(target)]
+        elif fmt == "sprite":
+            columns, rows = SPRITE_GRID
+            duration = probe_duration(input_mp4) or columns * rows
+            interval = max(duration / (columns * rows), 0.04)
+            graph.append(
+                f"[v{i}]fps=1/{interval:.3f},scale={SPRITE_TILE_WIDTH}:-2,tile={columns}x{rows}[sprite]"
+            )
+            target = output_dir / "thumbnails" / f"{stem}_sprite.png"
+            outputs += ["-map", "[sprite]", "-frames:v", "1", "-update", "1", str(target)]
+        else:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        targets[fmt] = target
+
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", input_mp4, "-filter_complex", ";".join(graph), *outputs]
+
+    print(f"🎞️  导出格式: {', '.join(branches)}（一次解码）")
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+    except subprocess.TimeoutExpired:
+        print("❌ 错误: 转换超时")
+        return results
+
+    if result.returncode != 0:
+        print("❌ 转换失败!")
+        print(result.stderr)
+        return results
+
+    for fmt, target in targets.items():
+        results[fmt] = target.parent if fmt == "png" else target
+        print(f"   ✅ {fmt}: {results[fmt]}")
+    return results
+
+
+def unavailable_formats(formats: list) -> list:
+    """
+    当前 ffmpeg 无法导出的格式（渲染前检查，避免渲染完成后才发现导出失败）
+
+    Args:
+        formats: 需要的格式列表
+
+    Returns:
+        list: 无法导出的格式；未安装 ffmpeg 时为除 mp4 外的全部格式
+    """
+    extra = [fmt for fmt in dict.fromkeys(formats) if fmt != "mp4"]
+    if not extra:
+        return []
+    ffmpeg_info = get_tool_info("ffmpeg")
+    if ffmpeg_info is None:
+        return extra
+    if "webm" in extra and "libvpx-vp9" not in ffmpeg_info["capabilities"]["encoders"]:
+        return ["webm"]
+    return []
+
+
+def check_formats(formats: list):
+    """有无法导出的格式时在渲染前退出"""
+    missing = unavailable_formats(formats)
+    if not missing:
+        return
+    if get_tool_info("ffmpeg") is None:
+        print(f"❌ 错误: 导出 {', '.join(missing)} 需要 ffmpeg")
+        print("   安装: sudo apt-get install ffmpeg")
+    else:
+        print("❌ 错误: 当前 ffmpeg 不支持 libvpx-vp9，无法导出 webm")
+    sys.exit(1)
+
+
+def parse_formats(value: str) -> list:
+    """解析 --format 参数: 逗号分隔的格式列表（重复的格式只保留一个）"""
+    formats = [fmt.strip() for fmt in value.split(",") if fmt.strip()]
+    invalid = [fmt for fmt in formats if fmt not in FORMAT_CHOICES]
+    if invalid or not formats:
+        raise argparse.ArgumentTypeError(
+            f"无效的格式 '{value}'，可选: {', '.join(FORMAT_CHOICES)}（可用逗号组合）"
+        )
+    return list(dict.fromkeys(formats))
+
+
+def discover_scenes(scene_file: str) -> list[str]:
+    """
+    静态解析文件中的所有 Scene 子类（不导入 manim）
+
+    基类名以 "Scene" 结尾（Scene、MovingCameraScene、ThreeDScene 等），
+    或继承自同文件中已识别的场景类，即视为可渲染场景。
+
+    Args:
+        scene_file: Scene .py 文件路径
+
+    Returns:
+        list[str]: 按定义顺序排列的场景类名
+    """
+    source = Path(scene_file).read_text(encoding="utf-8")
+    tree = ast.parse(source, filename=scene_file)
+
+    scenes = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for base in node.bases:
+            # 支持 Scene 和 manim.Scene 两种写法
+            base_name = base.attr if isinstance(base, ast.Attribute) else getattr(base, "id", "")
+            if base_name.endswith("Scene") or base_name in scenes:
+                scenes.append(node.name)
+                break
+    return scenes
+
+
+def load_manifest(manifest_file: str, default_quality: str = "high", default_formats: list = None) -> list[dict]:
+    """
+    加载批量渲染清单
+
+    清单为 JSON 数组，每项包含 file、scene（可选，缺省时渲染文件内全部场景）、
+    quality（可选）和 format（可选，字符串或列表）。相对路径以清单文件所在目录为基准。
+
+    Args:
+        manifest_file: 清单文件路径
+        default_quality: 未指定 quality 时使用的质量
+        default_formats: 未指定 format 时使用的输出格式列表
+
+    Returns:
+        list[dict]: 展开后的任务列表
+    """
+    manifest_path = Path(manifest_file)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    jobs = []
+    for entry in entries:
+        scene_file = Path(entry["file"])
+        if not scene_file.is_absolute():
+            scene_file = manifest_path.parent / scene_file
+        quality = entry.get("quality", default_quality)
+        formats = entry.get("format", default_formats or ["mp4"])
+        formats = parse_formats(formats) if isinstance(formats, str) else list(dict.fromkeys(formats))
+        scene_names = [entry["scene"]] if entry.get("scene") else discover_scenes(str(scene_file))
+        for scene_name in scene_names:
+            jobs.append({"file": str(scene_file), "scene": scene_name, "quality": quality, "formats": formats})
+    return jobs
+
+
+def _run_batch_job(job: dict, use_cache: bool, gif_options: dict = None, engine: str = "cli") -> dict:
+    """在工作进程中执行单个批量任务，捕获其控制台输出
+
+    附加格式（GIF、WebM 等）也在工作进程中导出，与其他任务的渲染并发进行。
+    """
+    started = time.time()
+    captured = io.StringIO()
+    with contextlib.redirect_stdout(captured):
+        try:
+            success, output_dir = build_scene(
+                scene_file=job["file"],
+                scene_name=job["scene"],
+                quality=job["quality"],
+                use_cache=use_cache,
+                engine=engine
+            )
+            formats = [fmt for fmt in job.get("formats", ["mp4"]) if fmt != "mp4"]
+            if success and formats:
+                video_file = find_output_video(output_dir, job["scene"], job["quality"])
+                if video_file:
+                    exported = export_formats(str(video_file), output_dir, formats, gif_options)
+                    success = len(exported) == len(formats)
+        except Exception as e:
+            print(f"❌ 错误: {e}")
+            success, output_dir = False, None
+
+    result = dict(job)
+    result.update({
+        "success": success,
+        "output_dir": str(output_dir) if output_dir else None,
+        "duration": round(time.time() - started, 2)
+    })
+    if not success:
+        result["output"] = captured.getvalue()
+    return result
+
+
+def build_batch(
+    jobs: list[dict],
+    max_workers: int = None,
+    use_cache: bool = True,
+    gif_options: dict = None,
+    engine: str = "cli"
+) -> dict:
+    """
+    在有界进程池中并发渲染多个场景
+
+    Args:
+        jobs: 任务列表，每项包含 file、scene、quality，可选 formats
+        max_workers: 最大并发数（默认: CPU 核数）
+        use_cache: 是否使用渲染缓存
+        gif_options: 传给 export_to_gif 的参数（fps、scale、start、end、max_bytes）
+        engine: 渲染引擎（cli / inprocess / worker，见 ENGINE_CHOICES）；
+            inprocess 时每个池进程只导入一次 manim，在其处理的所有任务间复用
+
+    Returns:
+        dict: 汇总报告
+    """
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs) or 1))
+    started = time.time()
+
+    # 在主进程中先探测一次，工作进程直接读取磁盘缓存
+    get_tool_info("manim")
+    if any(fmt != "mp4" for job in jobs for fmt in job.get("formats", [])):
+        get_tool_info("ffmpeg")
+
+    print(f"🎬 批量编译: {len(jobs)} 个场景，{max_workers} 个并发")
+    print("-" * 50)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_batch_job, job, use_cache, gif_options, engine) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = "✅" if result["success"] else "❌"
+            print(f"{status} [{len(results)}/{len(jobs)}] {result['scene']} ({result['quality']}) - {result['duration']}s")
+
+    # 按提交顺序输出，便于对比
+    order = {(job["file"], job["scene"], job["quality"]): i for i, job in enumerate(jobs)}
+    results.sort(key=lambda r: order.get((r["file"], r["scene"], r["quality"]), 0))
+
+    succeeded = sum(1 for r in results if r["success"])
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "workers": max_workers,
+        "duration": round(time.time() - started, 2),
+        "results": results
+    }
+
+    OUTPUT_BASE_DIR.mkdir(parents=True, exist_ok=True)
+    report_file = OUTPUT_BASE_DIR / f"batch_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print("-" * 50)
+    print(f"📊 成功: {succeeded}/{len(results)}，总耗时 {report['duration']}s")
+    for result in results:
+        if not result["success"]:
+            print(f"   ❌ {result['file']}::{result['scene']} ({result['quality']})")
+    print(f"📋 汇总报告: {report_file}")
+
+    return report
+
+
+def _write_preview_status(preview_dir: Path, **status):
+    """更新 preview/status.json（先写临时文件再替换，读取方不会读到半个文件）"""
+    status_file = preview_dir / "status.json"
+    current = {}
+    if status_file.exists():
+        with open(status_file, "r", encoding="utf-8") as f:
+            current = json.load(f)
+    current.update(status)
+    current["updated_at"] = datetime.now().isoformat()
+    tmp_file = status_file.with_suffix(".json.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, status_file)
+
+
+def build_preview(
+    scene_file: str,
+    scene_name: str = "Scene",
+    quality: str = "high",
+    description: str = "",
+    background: bool = True,
+    use_cache: bool = True,
+    timeout: int = None,
+    engine: str = "cli",
+    formats: list = None,
+    gif_options: dict = None
+) -> tuple[bool, Path]:
+    """
+    快速预览: 并行生成最后一帧 PNG 和 480p/15fps 代理视频，再渲染完整质量
+
+    预览产物:
+        preview/<SceneName>.png   最后一帧（manim -s）
+        preview/<SceneName>.mp4   代理视频，完整渲染完成后被原子替换为完整质量版本
+        preview/status.json       当前阶段: proxy → rendering → final / failed
+
+    Args:
+        scene_file: Scene .py 文件路径
+        scene_name: 场景类名
+        quality: 完整渲染的质量
+        description: 场景描述
+        background: 完整渲染是否在后台进程中进行
+        use_cache: 完整渲染是否使用渲染缓存
+        timeout: 完整渲染的超时秒数（None 表示自动估算）
+        engine: 完整渲染的引擎（见 ENGINE_CHOICES）
+        formats: 完整渲染后导出的格式（同 --format）
+        gif_options: GIF 参数（fps、scale、start、end、max_bytes）
+
+    Returns:
+        (success, output_dir): 预览是否成功和输出目录路径
+    """
+    scene_path = Path(scene_file)
+    if not scene_path.exists():
+        print(f"❌ 错误: 找不到文件 '{scene_file}'")
+        return False, None
+
+    if not check_manim_installed():
+        print("❌ 错误: manim 未安装")
+        print("   请运行: pip install manim")
+        return False, None
+
+    output_dir = create_output_structure(scene_name, quality, description)
+    copy_scene_file(scene_path, output_dir)
+    preview_dir = output_dir / "preview"
+    preview_dir.mkdir(exist_ok=True)
+
+    proxy_timeout = estimate_render_timeout(str(scene_path), scene_name, "low")
+    low_flag = QUALITY_MAP["low"]["flag"]
+    # 两个预览任务使用独立的 media 目录，避免并发写同一目录
+    frame_media = preview_dir / "media_frame"
+    proxy_media = preview_dir / "media_proxy"
+    frame_cmd = ["manim", low_flag, "-s", "--media_dir", str(frame_media), str(scene_path), scene_name]
+    proxy_cmd = ["manim", low_flag, "--media_dir", str(proxy_media), str(scene_path), scene_name]
+
+    print(f"👀 快速预览: {scene_name}")
+    print(f"📁 输出目录: {output_dir}")
+    print("-" * 50)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        frame_future = executor.submit(run_manim, frame_cmd, output_dir / "logs" / "preview_frame.log", proxy_timeout)
+        proxy_future = executor.submit(run_manim, proxy_cmd, output_dir / "logs" / "preview_proxy.log", proxy_timeout)
+        frame_code, frame_tail, _ = frame_future.result()
+        proxy_code, proxy_tail, _ = proxy_future.result()
+
+    frame_file = None
+    if frame_code == 0:
+        for image in frame_media.glob(f"images/*/{scene_name}*.png"):
+            frame_file = preview_dir / f"{scene_name}.png"
+            link_or_copy(image, frame_file, allow_symlink=False)
+            print(f"🖼️  最后一帧: {frame_file}")
+            break
+
+    proxy_file = None
+    if proxy_code == 0:
+        for video in proxy_media.glob(f"videos/*/*/{scene_name}.mp4"):
+            proxy_file = preview_dir / f"{scene_name}.mp4"
+            link_or_copy(video, proxy_file, allow_symlink=False)
+            print(f"🎞️  代理视频: {proxy_file}")
+            break
+
+    if frame_file is None and proxy_file is None:
+        print("❌ 预览失败!")
+        print("\n".join(proxy_tail or frame_tail))
+        _write_preview_status(preview_dir, stage="failed")
+        return False, output_dir
+
+    _write_preview_status(
+        preview_dir,
+        stage="proxy",
+        quality=quality,
+        frame=str(frame_file) if frame_file else None,
+        video=str(proxy_file) if proxy_file else None
+    )
+
+    extra_formats = [fmt for fmt in formats or [] if fmt != "mp4"]
+    if not background:
+        success, _ = build_scene(
+            str(scene_path), scene_name, quality,
+            custom_output_dir=str(output_dir),
+            use_cache=use_cache,
+            timeout=timeout,
+            engine=engine
+        )
+        video_file = find_output_video(output_dir, scene_name, quality) if success else None
+        if video_file:
+            finalize_preview(output_dir, video_file)
+            if extra_formats:
+                exported = export_formats(str(video_file), output_dir, extra_formats, gif_options)
+                success = len(exported) == len(extra_formats)
+        else:
+            _write_preview_status(preview_dir, stage="failed")
+        return success, output_dir
+
+    # 完整渲染在独立会话中运行，本进程退出后继续
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()), str(scene_path),
+        "--scene", scene_name, "--quality", quality,
+        "--resume", str(output_dir), "--replace-preview",
+        "--engine", engine
+    ]
+    if not use_cache:
+        cmd.append("--no-cache")
+    if timeout:
+        cmd += ["--timeout", str(timeout)]
+    if extra_formats:
+        cmd += ["--format", ",".join(formats)]
+        cmd += _gif_args(gif_options or {})
+    # 启动之后本进程不再写状态文件: 后台进程自己写入 pid 和最终状态，
+    # 即使它很快完成（如命中缓存）也不会被这里的 "rendering" 覆盖
+    _write_preview_status(preview_dir, stage="rendering", pid=None)
+    with open(output_dir / "logs" / "background.log", "w", encoding="utf-8") as log:
+        process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+    print(f"🎬 完整渲染 ({quality}) 已在后台启动，PID {process.pid}")
+    print(f"📋 状态: {preview_dir / 'status.json'}")
+    return True, output_dir
+
+
+def _gif_args(gif_options: dict) -> list:
+    """把 GIF 参数还原为命令行参数，传给后台的完整渲染进程"""
+    args = []
+    for name, flag in (("fps", "--gif-fps"), ("scale", "--gif-scale"), ("start", "--gif-start"), ("end", "--gif-end")):
+        if gif_options.get(name) is not None:
+            args += [flag, str(gif_options[name])]
+    if gif_options.get("max_bytes"):
+        args += ["--gif-max-kb", str(gif_options["max_bytes"] // 1024)]
+    return args
+
+
+def finalize_preview(output_dir: Path, video_file: Path):
+    """用完整质量视频原子替换代理视频，并更新预览状态"""
+    preview_dir = output_dir / "preview"
+    preview_dir.mkdir(exist_ok=True)
+    proxy_file = preview_dir / f"{video_file.stem}.mp4"
+    tmp_file = preview_dir / f".{video_file.stem}.mp4.tmp"
+    if tmp_file.exists():
+        tmp_file.unlink()
+    link_or_copy(video_file, tmp_file)
+    os.replace(tmp_file, proxy_file)
+    _write_preview_status(preview_dir, stage="final", video=str(proxy_file), final_video=str(video_file))
+    print(f"🔄 代理视频已替换为完整版本: {proxy_file}")
+
+
+# --progress-json 的输出流: 导入时的 stdout。该模式下 main() 把其余输出改到 stderr，
+# stdout 上只有 JSON lines，调用方可以逐行解析
+PROGRESS_STREAM = sys.stdout
+
+
+def print_progress_json(event: dict):
+    """以 JSON lines 格式输出进度事件"""
+    print(json.dumps(event, ensure_ascii=False), file=PROGRESS_STREAM, flush=True)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Manim 场景编译脚本",
@@ -362,10 +2280,14 @@ def main():
   %(prog)s scene.py MyScene
   %(prog)s scene.py MyScene --quality high
   %(prog)s scene.py MyScene --format gif
+  %(prog)s scene.py MyScene --format mp4,gif,webm,sprite
+  %(prog)s scene.py --all --quality low
+  %(prog)s --manifest jobs.json --jobs 8
+  %(prog)s scene.py --scene MyScene --preview
         """
     )
 
-    parser.add_argument("file", help="Scene .py 文件路径")
+    parser.add_argument("file", nargs="?", help="Scene .py 文件路径")
     parser.add_argument("--scene", default="Scene", help="场景类名（默认: Scene）")
     parser.add_argument(
         "--quality",
@@ -380,33 +2302,189 @@ def main():
     )
     parser.add_argument(
         "--format",
-        choices=["mp4", "gif", "png"],
-        default="mp4",
-        help="输出格式（默认: mp4）"
+        type=parse_formats,
+        default=["mp4"],
+        help=f"输出格式，可用逗号组合，只解码一次（可选: {', '.join(FORMAT_CHOICES)}，默认: mp4）"
     )
     parser.add_argument("--output", help="自定义输出目录（覆盖默认组织结构）")
+    parser.add_argument("--no-cache", action="store_true", help="跳过渲染缓存，强制重新渲染")
+    parser.add_argument("--all", action="store_true", help="批量编译文件中的所有场景")
+    parser.add_argument("--manifest", help="批量渲染清单（JSON: [{file, scene, quality}, ...]）")
+    parser.add_argument("--jobs", type=int, help="批量模式最大并发数（默认: CPU 核数）")
+    parser.add_argument("--progress-json", action="store_true", help="以 JSON lines 格式实时输出渲染进度到 stdout（其余输出改到 stderr）")
+    parser.add_argument("--timeout", type=int, help="单次渲染超时秒数（默认: 按质量和动画数量估算）")
+    parser.add_argument("--resume", metavar="OUTPUT_DIR", help="在超时或失败的输出目录中继续渲染")
+    parser.add_argument("--preview", action="store_true", help="先生成最后一帧和 480p 代理视频，再在后台渲染完整质量")
+    parser.add_argument("--replace-preview", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--engine",
+        choices=ENGINE_CHOICES,
+        default="cli",
+        help="渲染引擎: cli 调用 manim 命令；inprocess/worker 只导入一次 manim（默认: cli）"
+    )
+    parser.add_argument("--gif-fps", type=int, default=GIF_FPS, help=f"GIF 帧率（默认: {GIF_FPS}）")
+    parser.add_argument("--gif-scale", type=float, default=1.0, help="GIF 缩放比例（默认: 1.0）")
+    parser.add_argument("--gif-start", type=float, help="GIF 起始时间（秒）")
+    parser.add_argument("--gif-end", type=float, help="GIF 结束时间（秒）")
+    parser.add_argument("--gif-max-kb", type=int, help="GIF 大小预算（KB），超出时自动降低尺寸和帧率")
+    parser.add_argument("--list-builds", action="store_true", help="从构建索引列出 manim_outputs 中的构建")
+    parser.add_argument("--gc", action="store_true", help="按保留策略清理旧构建目录")
+    parser.add_argument("--dry-run", action="store_true", help="配合 --gc 使用: 只列出将被删除的构建")
+    parser.add_argument("--pin", metavar="PATTERN", help="固定构建目录（支持通配符），保留策略不会删除")
+    parser.add_argument("--unpin", metavar="PATTERN", help="取消固定构建目录")
+    parser.add_argument("--reindex", action="store_true", help="扫描 manim_outputs 重建构建索引")
+    parser.add_argument("--latest", metavar="SCENE", help="从构建索引查询场景在 --quality 下最近一次成功构建的视频")
 
     args = parser.parse_args()
 
+    if args.pin or args.unpin:
+        set_build_pinned(args.pin or args.unpin, pinned=bool(args.pin))
+        print(f"📌 已{'固定' if args.pin else '取消固定'}: {args.pin or args.unpin}")
+        sys.exit(0)
+
+    if args.reindex:
+        print(f"🗂️  已重建构建索引: {rebuild_build_index()} 个构建")
+        sys.exit(0)
+
+    if args.latest:
+        build = lookup_latest_build(args.latest, args.quality)
+        if not build:
+            print(f"❌ 没有 {args.latest} 在 {args.quality} 质量下的成功构建")
+            sys.exit(1)
+        touch_build(build["output_dir"])
+        print(build["video"])
+        sys.exit(0)
+
+    if args.list_builds:
+        patterns = load_retention_config().get("pinned", [])
+        builds = list_builds()
+        for record in builds:
+            status = "✅" if record.get("success") else "❌"
+            pin = " 📌" if is_build_pinned(record["name"], patterns) else ""
+            print(f"{status} {record['name']:<40} {record.get('quality') or '-':<7} {record.get('size_bytes', 0) / 1024 / 1024:>8.1f} MB{pin}")
+        total = sum(record.get("size_bytes", 0) for record in builds)
+        print(f"共 {len(builds)} 个构建，{total / 1024 / 1024:.1f} MB")
+        sys.exit(0)
+
+    if args.gc:
+        removed = enforce_retention(dry_run=args.dry_run)
+        action = "将删除" if args.dry_run else "已删除"
+        for name in removed:
+            print(f"🧹 {action}: {name}")
+        print(f"{action} {len(removed)} 个构建目录")
+        sys.exit(0)
+
+    if not args.file and not args.manifest:
+        parser.error("需要指定场景文件或 --manifest")
+
+    gif_options = {
+        "fps": args.gif_fps,
+        "scale": args.gif_scale,
+        "start": args.gif_start,
+        "end": args.gif_end,
+        "max_bytes": args.gif_max_kb * 1024 if args.gif_max_kb else None
+    }
+
+    # 批量模式
+    if args.all or args.manifest:
+        try:
+            if args.manifest:
+                jobs = load_manifest(args.manifest, default_quality=args.quality, default_formats=args.format)
+            else:
+                jobs = [
+                    {"file": args.file, "scene": scene_name, "quality": args.quality, "formats": args.format}
+                    for scene_name in discover_scenes(args.file)
+                ]
+        except FileNotFoundError as e:
+            print(f"❌ 错误: 找不到文件 '{e.filename}'")
+            sys.exit(1)
+        except SyntaxError as e:
+            print(f"❌ 错误: 场景文件语法错误 {e.filename}:{e.lineno}: {e.msg}")
+            sys.exit(1)
+        except KeyError as e:
+            print(f"❌ 错误: 清单项缺少字段 {e}")
+            sys.exit(1)
+        except (OSError, ValueError, TypeError, argparse.ArgumentTypeError) as e:
+            # 清单不是合法 JSON、格式无效等
+            print(f"❌ 错误: 无法加载渲染任务: {e}")
+            sys.exit(1)
+        if not jobs:
+            print("❌ 错误: 未找到可渲染的场景")
+            sys.exit(1)
+        check_formats([fmt for job in jobs for fmt in job["formats"]])
+        report = build_batch(
+            jobs,
+            max_workers=args.jobs,
+            use_cache=not args.no_cache,
+            gif_options=gif_options,
+            engine=args.engine
+        )
+        sys.exit(0 if report["failed"] == 0 else 1)
+
+    # 预览模式
+    if args.preview:
+        check_formats(args.format)
+        success, _ = build_preview(
+            scene_file=args.file,
+            scene_name=args.scene,
+            quality=args.quality,
+            description=args.description,
+            use_cache=not args.no_cache,
+            timeout=args.timeout,
+            engine=args.engine,
+            formats=args.format,
+            gif_options=gif_options
+        )
+        sys.exit(0 if success else 1)
+
+    if args.progress_json:
+        # 人类可读的输出改到 stderr，stdout 只保留 JSON 事件
+        sys.stdout = sys.stderr
+
+    check_formats(args.format)
+
+    if args.replace_preview and args.resume:
+        _write_preview_status(Path(args.resume) / "preview", pid=os.getpid())
+
     # 编译场景
     success, output_dir = build_scene(
         scene_file=args.file,
         scene_name=args.scene,
         quality=args.quality,
         description=args.description,
-        custom_output_dir=args.output
+        custom_output_dir=args.resume or args.output,
+        use_cache=not args.no_cache,
+        progress_callback=print_progress_json if args.progress_json else None,
+        timeout=args.timeout,
+        engine=args.engine
     )
 
-    if not success:
-        sys.exit(1)
-
-    # 如果需要 GIF 转换
-    if args.format == "gif" and output_dir:
-        video_file = find_output_video(output_dir / "output", args.scene, args.quality)
+    if args.replace_preview and output_dir:
+        video_file = find_output_video(output_dir, args.scene, args.quality) if success else None
         if video_file:
-            export_to_gif(str(video_file), output_dir)
+            finalize_preview(output_dir, video_file)
+        else:
+            _write_preview_status(output_dir / "preview", stage="failed")
 
-    sys.exit(0)
+    # 导出附加格式（一次解码，多路输出）
+    extra_formats = [fmt for fmt in args.format if fmt != "mp4"]
+    if success and extra_formats and output_dir:
+        video_file = find_output_video(output_dir, args.scene, args.quality)
+        if video_file:
+            exported = export_formats(str(video_file), output_dir, extra_formats, gif_options)
+            success = len(exported) == len(extra_formats)
+
+    # 最终结果事件，供渲染守护进程等调用方解析
+    if args.progress_json:
+        video_file = find_output_video(output_dir, args.scene, args.quality) if success and output_dir else None
+        print_progress_json({
+            "event": "result",
+            "success": success,
+            "output_dir": str(output_dir) if output_dir else None,
+            "video": str(video_file) if video_file else None
+        })
+
+    sys.exit(0 if success else 1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Manim Render Daemon
+本地渲染守护进程: 多个会话共享同一台机器的渲染能力
+
+守护进程监听 localhost HTTP，维护一个优先级任务队列和有界工作线程池，
+每个任务以 `build.py --progress-json` 子进程运行（独立进程组，可随时取消）。
+排队或运行中的相同任务（同一文件内容、场景、质量、格式）会被合并。
+
+HTTP 接口（JSON）:
+    POST   /jobs           提交任务 {"file", "scene", "quality", "formats", "priority", "engine"}
+    GET    /jobs           任务列表
+    GET    /jobs/<id>      任务状态（含最近一次进度事件）
+    DELETE /jobs/<id>      取消任务
+    GET    /health         守护进程状态
+
+使用方法:
+    python daemon.py serve --workers 4
+    python daemon.py submit scene.py --scene MyScene --quality high --wait
+    python daemon.py status <job_id>
+    python daemon.py cancel <job_id>
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from build import ENGINE_CHOICES, FORMAT_CHOICES, QUALITY_MAP
+
+# 默认监听地址
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 默认优先级（数字越小越先执行）
+DEFAULT_PRIORITY = 10
+
+# 内存中保留的已结束任务数
+MAX_FINISHED_JOBS = 500
+
+BUILD_SCRIPT = Path(__file__).resolve().parent / "build.py"
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+def job_dedup_key(scene_file: str, scene_name: str, quality: str, formats: list) -> str:
+    """相同文件内容 + 场景 + 质量 + 格式视为同一任务"""
+    digest = hashlib.sha256()
+    digest.update(Path(scene_file).read_bytes())
+    for part in (scene_name, quality, ",".join(sorted(formats))):
+        digest.update(b"\0")
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def validate_request(request: dict) -> dict:
+    """
+    检查并规范化提交的任务参数，在排队前发现错误而不是等 build.py 失败
+
+    Args:
+        request: {"file", "scene", "quality", "formats", "priority", "engine"}
+
+    Returns:
+        dict: 补全默认值后的参数（formats 去重）
+
+    Raises:
+        ValueError: 参数类型或取值无效
+    """
+    if not isinstance(request, dict):
+        raise ValueError("请求体必须是 JSON 对象")
+    scene_file = request.get("file")
+    scene_name = request.get("scene", "Scene")
+    quality = request.get("quality", "high")
+    formats = request.get("formats") or ["mp4"]
+    engine = request.get("engine", "cli")
+    priority = request.get("priority", DEFAULT_PRIORITY)
+
+    if not isinstance(scene_file, str) or not scene_file:
+        raise ValueError("缺少场景文件 file")
+    if not isinstance(scene_name, str) or not scene_name.isidentifier():
+        raise ValueError(f"无效的场景名 '{scene_name}'")
+    if quality not in QUALITY_MAP:
+        raise ValueError(f"无效的质量 '{quality}'，可选: {', '.join(QUALITY_MAP)}")
+    if not isinstance(formats, list) or any(fmt not in FORMAT_CHOICES for fmt in formats):
+        raise ValueError(f"无效的格式 {formats!r}，可选: {', '.join(FORMAT_CHOICES)}")
+    if engine not in ENGINE_CHOICES:
+        raise ValueError(f"无效的渲染引擎 '{engine}'，可选: {', '.join(ENGINE_CHOICES)}")
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise ValueError(f"优先级必须是整数: {priority!r}")
+
+    return {
+        "file": scene_file,
+        "scene": scene_name,
+        "quality": quality,
+        "formats": list(dict.fromkeys(formats)),
+        "engine": engine,
+        "priority": priority
+    }
+
+
+class RenderQueue:
+    """
+    优先级任务队列 + 有界工作线程池
+
+    Args:
+        workers: 并发渲染数
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.jobs = {}
+        self.heap = []
+        self.inflight = {}   # dedup_key → job_id（排队或运行中）
+        self.processes = {}  # job_id → Popen
+        self.counter = 0
+        self.condition = threading.Condition()
+        self.threads = []
+
+    def start(self):
+        """启动工作线程"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"render-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, request: dict) -> tuple[dict, bool]:
+        """
+        提交任务
+
+        Args:
+            request: {"file", "scene", "quality", "formats", "priority", "engine"}
+
+        Returns:
+            (job, deduplicated): 任务记录，以及是否合并到了已有任务
+
+        Raises:
+            ValueError: 参数无效（见 validate_request）
+            OSError: 场景文件不存在或无法读取
+        """
+        request = validate_request(request)
+        scene_file = str(Path(request["file"]).resolve())
+        scene_name = request["scene"]
+        quality = request["quality"]
+        formats = request["formats"]
+        key = job_dedup_key(scene_file, scene_name, quality, formats)
+
+        with self.condition:
+            existing = self.jobs.get(self.inflight.get(key))
+            # 已取消但子进程尚未退出的任务不再合并新提交
+            if existing and existing["status"] not in FINISHED_STATES:
+                return existing, True
+
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "status": QUEUED,
+                "file": scene_file,
+                "scene": scene_name,
+                "quality": quality,
+                "formats": formats,
+                "engine": request["engine"],
+                "priority": request["priority"],
+                "created_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "progress": None,
+                "output_dir": None,
+                "video": None,
+                "dedup_key": key
+            }
+            self.jobs[job["id"]] = job
+            self.inflight[key] = job["id"]
+            self.counter += 1
+            heapq.heappush(self.heap, (job["priority"], self.counter, job["id"]))
+            self.condition.notify()
+            return job, False
+
+    def cancel(self, job_id: str) -> dict:
+        """取消排队中或运行中的任务"""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] in FINISHED_STATES:
+                return job
+            if job["status"] == QUEUED:
+                self._finish(job, CANCELLED)
+            else:
+                job["status"] = CANCELLED
+                # 立即释放去重键，子进程退出前重新提交的相同任务会重新排队
+                if self.inflight.get(job["dedup_key"]) == job_id:
+                    del self.inflight[job["dedup_key"]]
+                process = self.processes.get(job_id)
+                if process and process.poll() is None:
+                    # 子进程在独立进程组中，连同 manim / ffmpeg 一起终止
+                    os.killpg(process.pid, signal.SIGTERM)
+            return job
+
+    def snapshot(self) -> dict:
+        """队列统计"""
+        with self.condition:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {"workers": self.workers, "jobs": counts}
+
+    def _finish(self, job: dict, status: str):
+        """标记任务结束（调用方需持有锁）"""
+        job["status"] = status
+        job["finished_at"] = datetime.now().isoformat()
+        if self.inflight.get(job["dedup_key"]) == job["id"]:
+            del self.inflight[job["dedup_key"]]
+
+        finished = [j for j in self.jobs.values() if j["status"] in FINISHED_STATES]
+        if len(finished) > MAX_FINISHED_JOBS:
+            finished.sort(key=lambda j: j["finished_at"])
+            for old in finished[:len(finished) - MAX_FINISHED_JOBS]:
+                del self.jobs[old["id"]]
+
+    def _next_job(self) -> dict:
+        """取出优先级最高的排队任务，跳过已取消的"""
+        with self.condition:
+            while True:
+                while not self.heap:
+                    self.condition.wait()
+                _, _, job_id = heapq.heappop(self.heap)
+                job = self.jobs.get(job_id)
+                if job and job["status"] == QUEUED:
+                    job["status"] = RUNNING
+                    job["started_at"] = datetime.now().isoformat()
+                    return job
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            self._run(job)
+
+    def _run(self, job: dict):
+        """以子进程运行 build.py，解析 JSON lines 进度和最终结果"""
+        cmd = [
+            sys.executable, str(BUILD_SCRIPT), job["file"],
+            "--scene", job["scene"],
+            "--quality", job["quality"],
+            "--format", ",".join(job["formats"]),
+            "--engine", job["engine"],
+            "--progress-json"
+        ]
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                start_new_session=True
+            )
+        except (OSError, ValueError) as e:
+            # 启动失败不能让工作线程退出，否则队列会少一个并发
+            with self.condition:
+                job["error"] = f"无法启动 build.py: {e}"
+                self._finish(job, CANCELLED if job["status"] == CANCELLED else FAILED)
+            return
+        with self.condition:
+            self.processes[job["id"]] = process
+            # 提交后、启动前被取消
+            if job["status"] == CANCELLED:
+                os.killpg(process.pid, signal.SIGTERM)
+
+        result = None
+        for line in process.stdout:
+            if not line.startswith("{"):
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if event.get("event") == "result":
+                result = event
+            else:
+                job["progress"] = event
+        process.wait()
+
+        with self.condition:
+            self.processes.pop(job["id"], None)
+            if result:
+                job["output_dir"] = result.get("output_dir")
+                job["video"] = result.get("video")
+            job["returncode"] = process.returncode
+            if job["status"] == CANCELLED:
+                self._finish(job, CANCELLED)
+            else:
+                self._finish(job, SUCCEEDED if process.returncode == 0 else FAILED)
+
+
+def make_handler(queue: RenderQueue):
+    """创建绑定到队列的 HTTP 请求处理类"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _public(self, job: dict) -> dict:
+            return {k: v for k, v in job.items() if k != "dedup_key"}
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", **queue.snapshot()})
+            elif self.path == "/jobs":
+                with queue.condition:
+                    jobs = [self._public(job) for job in queue.jobs.values()]
+                self._send(200, {"jobs": jobs})
+            elif self.path.startswith("/jobs/"):
+                job = queue.jobs.get(self.path[len("/jobs/"):])
+                if job is None:
+                    self._send(404, {"error": "任务不存在"})
+                else:
+                    self._send(200, self._public(job))
+            else:
+                self._send(404, {"error": "未知路径"})
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                self._send(404, {"error": "未知路径"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                job, deduplicated = queue.submit(request)
+            except OSError:
+                self._send(404, {"error": f"找不到文件 '{request.get('file')}'"})
+                return
+            except (ValueError, TypeError) as e:
+                self._send(400, {"error": str(e)})
+                return
+            self._send(200 if deduplicated else 201, {**self._public(job), "deduplicated": deduplicated})
+
+        def do_DELETE(self):
+            if not self.path.startswith("/jobs/"):
+                self._send(404, {"error": "未知路径"})
+                return
+            job = queue.cancel(self.path[len("/jobs/"):])
+            if job is None:
+                self._send(404, {"error": "任务不存在"})
+            else:
+                self._send(200, self._public(job))
+
+        def log_message(self, format, *args):
+            # 默认会把每个请求打印到 stderr，轮询时过于嘈杂
+            pass
+
+    return Handler
+
+
+def serve(host: str, port: int, workers: int):
+    """启动守护进程"""
+    queue = RenderQueue(workers)
+    queue.start()
+    server = ThreadingHTTPServer((host, port), make_handler(queue))
+    print(f"🛰️  渲染守护进程: http://{host}:{port}")
+    print(f"⚙️  并发渲染数: {workers}")
+    print(f"📁 输出目录: {Path.cwd() / 'manim_outputs'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 守护进程已停止")
+    finally:
+        server.server_close()
+
+
+def request_json(url: str, method: str = "GET", payload: dict = None) -> dict:
+    """发送 HTTP 请求并解析 JSON 响应"""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Manim 渲染守护进程",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  %(prog)s serve --workers 4
+  %(prog)s submit scene.py --scene MyScene --quality high --wait
+  %(prog)s status <job_id>
+  %(prog)s cancel <job_id>
+        """
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址（默认: {DEFAULT_HOST}）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"端口（默认: {DEFAULT_PORT}）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="启动守护进程")
+    serve_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并发渲染数（默认: CPU 核数）")
+
+    submit_parser = subparsers.add_parser("submit", help="提交渲染任务")
+    submit_parser.add_argument("file", help="Scene .py 文件路径")
+    submit_parser.add_argument("--scene", default="Scene", help="场景类名（默认: Scene）")
+    submit_parser.add_argument("--quality", choices=list(QUALITY_MAP), default="high")
+    submit_parser.add_argument("--format", default="mp4", help="输出格式，可用逗号组合（默认: mp4）")
+    submit_parser.add_argument("--engine", choices=ENGINE_CHOICES, default="cli")
+    submit_parser.add_argument("--priority", type=int, default=DEFAULT_PRIORITY, help="优先级，越小越先执行")
+    submit_parser.add_argument("--wait", action="store_true", help="等待任务结束并输出进度")
+
+    status_parser = subparsers.add_parser("status", help="查看任务状态（不指定 ID 时列出全部）")
+    status_parser.add_argument("job_id", nargs="?")
+
+    cancel_parser = subparsers.add_parser("cancel", help="取消任务")
+    cancel_parser.add_argument("job_id")
+
+    args = parser.parse_args()
+    base_url = f"http://{args.host}:{args.port}"
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers)
+        return
+
+    try:
+        if args.command == "submit":
+            job = request_json(f"{base_url}/jobs", "POST", {
+                "file": str(Path(args.file).resolve()),
+                "scene": args.scene,
+                "quality": args.quality,
+                "formats": args.format.split(","),
+                "engine": args.engine,
+                "priority": args.priority
+            })
+            if "error" in job:
+                print(f"❌ 错误: {job['error']}")
+                sys.exit(1)
+            note = "（合并到已有任务）" if job.get("deduplicated") else ""
+            print(f"📨 任务 {job['id']}: {job['status']}{note}")
+
+            if args.wait:
+                last_progress = None
+                while job["status"] not in FINISHED_STATES:
+                    time.sleep(1)
+                    job_id = job["id"]
+                    job = request_json(f"{base_url}/jobs/{job_id}")
+                    if "error" in job:
+                        # 已结束的任务超过 MAX_FINISHED_JOBS 后会被清理，或守护进程已重启
+                        print(f"❓ 任务 {job_id}: 状态未知（{job['error']}）")
+                        sys.exit(1)
+                    progress = job.get("progress")
+                    if progress and progress != last_progress and progress.get("event") == "progress":
+                        print(f"   🎞️  动画 {progress['animation']}: {progress['percent']}%")
+                    last_progress = progress
+                status = "✅" if job["status"] == SUCCEEDED else "❌"
+                print(f"{status} 任务 {job['id']}: {job['status']}")
+                if job.get("video"):
+                    print(f"📺 视频文件: {job['video']}")
+                sys.exit(0 if job["status"] == SUCCEEDED else 1)
+
+        elif args.command == "status":
+            path = f"/jobs/{args.job_id}" if args.job_id else "/jobs"
+            print(json.dumps(request_json(base_url + path), indent=2, ensure_ascii=False))
+
+        elif args.command == "cancel":
+            job = request_json(f"{base_url}/jobs/{args.job_id}", "DELETE")
+            if "error" in job:
+                print(f"❌ 错误: {job['error']}")
+                sys.exit(1)
+            print(f"🛑 任务 {job['id']}: {job['status']}")
+
+    except urllib.error.URLError:
+        print(f"❌ 错误: 无法连接渲染守护进程 {base_url}")
+        print("   启动: python daemon.py serve")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Manim In-Process Render Engine
+进程内渲染引擎: 只导入一次 manim，直接驱动 Scene.render()
+
+两种用法:
+1. 进程内渲染: render_in_process() 在当前进程中渲染，首次调用时导入 manim，
+   同一进程中后续的渲染跳过导入开销（批量模式的每个工作进程各导入一次）。
+2. 常驻工作进程: RenderWorker 启动 `python engine.py --serve`，通过管道以 JSON lines
+   收发任务，manim 在工作进程中只导入一次，之后的渲染都是"热"的。
+
+协议（每行一个 JSON 对象）:
+    请求: {"scene_file": "...", "scene_name": "...", "manim_quality": "high_quality",
+           "media_dir": "...", "log_file": "..."}
+    响应: {"success": true, "video": "...", "duration": 1.23}
+          {"success": false, "error": "Traceback ..."}
+
+注意: 场景文件每次都会重新加载，但场景 import 的本地模块（如 tools.py）
+在同一工作进程中只加载一次，修改后需重启工作进程。
+"""
+
+import contextlib
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+# manim-tools 的 enable_tex_cache / enable_text_cache 把这些目录指向共享的持久缓存。
+# tempconfig 退出时恢复整个配置，渲染期间（如场景模块在 construct 中导入 tools）设置的缓存目录
+# 需要带出 tempconfig，常驻工作进程之后的渲染才能继续使用
+SHARED_CACHE_DIR_KEYS = ("tex_dir", "text_dir")
+
+
+def load_scene_class(scene_file: str, scene_name: str):
+    """
+    从文件加载场景类（每次都重新执行模块，保证读取到最新代码）
+
+    Args:
+        scene_file: Scene .py 文件路径
+        scene_name: 场景类名
+
+    Returns:
+        场景类
+    """
+    scene_path = Path(scene_file).resolve()
+    # 模块名带上路径哈希，避免不同文件的同名模块互相覆盖
+    module_name = f"_manim_scene_{hashlib.sha1(str(scene_path).encode()).hexdigest()[:12]}"
+    spec = importlib.util.spec_from_file_location(module_name, scene_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+
+    # 场景目录加入 sys.path，支持 import 同目录的辅助模块
+    scene_dir = str(scene_path.parent)
+    if scene_dir not in sys.path:
+        sys.path.insert(0, scene_dir)
+
+    spec.loader.exec_module(module)
+    if not hasattr(module, scene_name):
+        raise AttributeError(f"{scene_file} 中没有场景类 '{scene_name}'")
+    return getattr(module, scene_name)
+
+
+def _shared_cache_dirs(config) -> dict:
+    """当前配置中指向固定目录的缓存目录（未设置的仍是 "{media_dir}/Tex" 这样的模板，不带出）"""
+    dirs = {}
+    for key in SHARED_CACHE_DIR_KEYS:
+        value = config._d.get(key)
+        if value is not None and "{" not in str(value):
+            dirs[key] = str(value)
+    return dirs
+
+
+def render_in_process(scene_file: str, scene_name: str, manim_quality: str, media_dir: str, log_file: str = None) -> dict:
+    """
+    在当前进程中渲染场景
+
+    Args:
+        scene_file: Scene .py 文件路径
+        scene_name: 场景类名
+        manim_quality: manim 质量名（low_quality / medium_quality / high_quality / fourk_quality）
+        media_dir: manim media 目录
+        log_file: manim 控制台输出写入的日志文件
+
+    Returns:
+        dict: {"success", "video" | "error", "duration"}
+    """
+    started = time.time()
+    log = open(log_file, "a", encoding="utf-8") if log_file else open(os.devnull, "w")
+    try:
+        with log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            from manim import config, tempconfig
+
+            scene_class = load_scene_class(scene_file, scene_name)
+            options = {
+                "quality": manim_quality,
+                "media_dir": str(media_dir),
+                # input_file 决定 media/videos/<模块名>/ 目录，与 CLI 模式保持一致
+                "input_file": str(Path(scene_file).resolve()),
+                "scene_names": [scene_name],
+                "progress_bar": "none"
+            }
+            with tempconfig(options):
+                scene = scene_class()
+                scene.render()
+                video = scene.renderer.file_writer.movie_file_path
+                shared_dirs = _shared_cache_dirs(config)
+            for key, value in shared_dirs.items():
+                config[key] = value
+
+        return {
+            "success": True,
+            "video": str(video) if video else None,
+            "duration": round(time.time() - started, 3)
+        }
+    except Exception:
+        return {
+            "success": False,
+            "error": traceback.format_exc(),
+            "duration": round(time.time() - started, 3)
+        }
+
+
+class RenderWorker:
+    """
+    常驻渲染工作进程
+
+    工作进程启动时导入 manim，之后通过管道逐个处理任务。
+    超时的任务会终止工作进程，下一个任务自动重启一个新的。
+
+    用法:
+        worker = RenderWorker()
+        result = worker.render("scene.py", "MyScene", "high_quality", "media")
+        worker.close()
+    """
+
+    def __init__(self):
+        self.process = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """启动工作进程（已在运行则直接返回）"""
+        if self.process and self.process.poll() is None:
+            return
+        self.process = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "--serve"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1
+        )
+
+    def render(self, scene_file: str, scene_name: str, manim_quality: str, media_dir: str,
+               log_file: str = None, timeout: float = None) -> dict:
+        """
+        提交一个渲染任务并等待结果
+
+        Args:
+            scene_file: Scene .py 文件路径
+            scene_name: 场景类名
+            manim_quality: manim 质量名
+            media_dir: manim media 目录
+            log_file: 日志文件
+            timeout: 超时（秒），超时后终止工作进程
+
+        Returns:
+            dict: 与 render_in_process 相同，超时时额外包含 "timed_out": True
+        """
+        with self.lock:
+            self.start()
+            job = {
+                "scene_file": str(Path(scene_file).resolve()),
+                "scene_name": scene_name,
+                "manim_quality": manim_quality,
+                "media_dir": str(Path(media_dir).resolve()),
+                "log_file": str(Path(log_file).resolve()) if log_file else None
+            }
+            self.process.stdin.write(json.dumps(job, ensure_ascii=False) + "\n")
+            self.process.stdin.flush()
+
+            timer = None
+            timed_out = threading.Event()
+            if timeout:
+                def kill_on_timeout():
+                    timed_out.set()
+                    self.process.kill()
+                timer = threading.Timer(timeout, kill_on_timeout)
+                timer.daemon = True
+                timer.start()
+
+            try:
+                line = self.process.stdout.readline()
+            finally:
+                if timer:
+                    timer.cancel()
+
+            if not line:
+                # 工作进程崩溃或被超时终止，下次调用时重启
+                self.process.wait()
+                self.process = None
+                return {
+                    "success": False,
+                    "timed_out": timed_out.is_set(),
+                    "error": "渲染超时，工作进程已终止" if timed_out.is_set() else "工作进程意外退出"
+                }
+            return json.loads(line)
+
+    def close(self):
+        """关闭工作进程"""
+        if self.process and self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+def serve():
+    """
+    工作进程主循环: 从 stdin 读取任务，向 stdout 写出结果
+
+    协议输出使用复制出来的原始 stdout，fd 1 重定向到 stderr，
+    manim 或其子进程直接写 stdout 也不会破坏协议。
+    """
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    # 预先导入 manim，之后的任务都是热渲染
+    import manim  # noqa: F401
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+            result = render_in_process(
+                job["scene_file"],
+                job["scene_name"],
+                job["manim_quality"],
+                job["media_dir"],
+                job.get("log_file")
+            )
+        except Exception:
+            result = {"success": False, "error": traceback.format_exc()}
+        protocol.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv[1:]:
+        serve()
+    else:
+        print("用法: python engine.py --serve   # 启动常驻渲染工作进程（JSON lines 协议）")
+        sys.exit(1)
@@ -7,16 +7,187 @@ Manim Tools Library
     from tools.tools import *
     或
     from tools.tools import create_circle, plot_sine
+
+延迟导入:
+    导入本模块不会导入 manim / numpy。第一次调用工具函数（或 from tools import *、
+    访问 manim 的名字）时才导入 manim，并把 manim 的全部名字放入本模块，
+    因此 `from tools import *` 的场景仍然可以直接使用 Scene、Create 等。
+    HELPERS 注册表（名称、分类、签名、文档）不依赖 manim，可供工具和生成器直接查询:
+        python tools.py --list [关键字]
+
+公式与文字缓存:
+    导入时把 manim 的 tex_dir / text_dir 指向共享的持久目录（默认 ~/.cache/manim-tools/tex
+    和 ~/.cache/manim-tools/text，可用环境变量 MANIM_TOOLS_TEX_CACHE / MANIM_TOOLS_TEXT_CACHE
+    修改，设为 off 关闭），MathTex / Tex 的 LaTeX 编译结果和 Text 的字形轮廓在不同构建目录之间复用。
 """
 
-from manim import *
-import numpy as np
+from __future__ import annotations
+
+import argparse
+import ast
+import functools
+import inspect
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# 共享的 LaTeX 编译缓存目录。manim 按完整 tex 文件内容（公式 + 模板）的哈希命名 SVG，
+# 目录本身就是内容寻址的缓存
+TEX_CACHE_DIR = Path(os.environ.get("MANIM_TOOLS_TEX_CACHE") or Path.home() / ".cache" / "manim-tools" / "tex")
+
+# 共享的文字字形缓存目录。manim 按文字、字体、字号等设置的哈希命名 Pango 输出的 SVG
+TEXT_CACHE_DIR = Path(os.environ.get("MANIM_TOOLS_TEXT_CACHE") or Path.home() / ".cache" / "manim-tools" / "text")
+
+# 本进程内公式预编译的累计统计
+TEX_CACHE_STATS = {"formulas": 0, "hits": 0, "misses": 0, "failed": 0, "compile_seconds": 0.0}
+
+# 不带坐标系的向量化采样步长（与 FunctionGraph / ParametricFunction 的默认步长一致）
+FUNCTION_GRAPH_STEP = 0.01
+
+# 几何缓存的默认内存上限（按缓存图像的点数组大小计算）
+GEOMETRY_CACHE_MAX_BYTES = 64 * 1024 ** 2
+
+# 几何缓存状态，默认关闭，调用 enable_geometry_cache() 开启
+_GEOMETRY_CACHE = {
+    "enabled": False,
+    "max_bytes": GEOMETRY_CACHE_MAX_BYTES,
+    "entries": OrderedDict(),
+    "bytes": 0,
+    "hits": 0,
+    "misses": 0
+}
+
+# 工具函数注册表: 名称 → {name, category, signature, returns, doc}，不需要导入 manim
+HELPERS = {}
+
+_MANIM_LOADED = False
+
+# _load_manim 放入本模块的名字（manim 的公开名字和 np），与 HELPERS 一起组成 __all__
+_MANIM_NAMES = []
+
+
+class _ManimDefault:
+    """manim 常量作为参数默认值的占位符，调用时才求值（签名中仍显示常量名，如 color=BLUE）"""
+
+    def __init__(self, expr: str):
+        self.expr = expr
+
+    def __repr__(self):
+        return self.expr
+
+    def resolve(self):
+        return eval(self.expr, globals())
+
+
+def _load_manim():
+    """导入 manim 和 numpy，把 manim 的名字放入本模块（已有的名字不覆盖），并启用共享缓存"""
+    global _MANIM_LOADED
+    if _MANIM_LOADED:
+        return
+
+    import manim
+    import numpy
+
+    module_globals = globals()
+    names = getattr(manim, "__all__", None) or [name for name in dir(manim) if not name.startswith("_")]
+    for name in names:
+        module_globals.setdefault(name, getattr(manim, name))
+    module_globals.setdefault("np", numpy)
+    _MANIM_NAMES.extend(names)
+    _MANIM_NAMES.append("np")
+    _MANIM_LOADED = True
+
+    if os.environ.get("MANIM_TOOLS_TEX_CACHE") != "off":
+        try:
+            enable_tex_cache()
+        except OSError:
+            pass
+
+    if os.environ.get("MANIM_TOOLS_TEXT_CACHE") != "off":
+        try:
+            enable_text_cache()
+        except OSError:
+            pass
+
+
+def __getattr__(name: str):
+    """访问 manim 的名字（以及 from tools import *）时才导入 manim"""
+    if name.startswith("__") and name != "__all__":
+        raise AttributeError(name)
+    _load_manim()
+    if name == "__all__":
+        # 只导出 manim 的名字和工具函数，不导出 argparse、Path 等本模块自己的导入
+        return list(dict.fromkeys(_MANIM_NAMES + list(HELPERS)))
+    try:
+        return globals()[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+
+def helper(category: str):
+    """
+    注册工具函数: 记录签名和文档到 HELPERS，调用时先导入 manim 并求值 manim 常量默认值
+
+    Args:
+        category: 分类（如 "几何图形"）
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        plain = signature.replace(
+            parameters=[p.replace(annotation=inspect.Parameter.empty) for p in signature.parameters.values()],
+            return_annotation=inspect.Signature.empty
+        )
+        HELPERS[func.__name__] = {
+            "name": func.__name__,
+            "category": category,
+            "signature": f"{func.__name__}{plain}",
+            "returns": func.__annotations__.get("return"),
+            "doc": inspect.getdoc(func)
+        }
+        lazy_defaults = {
+            name: p.default for name, p in signature.parameters.items()
+            if isinstance(p.default, _ManimDefault)
+        }
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _load_manim()
+            if lazy_defaults:
+                given = signature.bind_partial(*args, **kwargs).arguments
+                for name, default in lazy_defaults.items():
+                    if name not in given:
+                        kwargs[name] = default.resolve()
+            return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def list_helpers(keyword: str = None) -> list:
+    """列出注册的工具函数（不导入 manim）
+
+    Args:
+        keyword: 按名称、分类或文档过滤的关键字
+
+    Returns:
+        HELPERS 中的记录列表
+    """
+    keyword = (keyword or "").lower()
+    return [
+        record for record in HELPERS.values()
+        if not keyword or any(keyword in (record[field] or "").lower() for field in ("name", "category", "doc"))
+    ]
+
 
 # =============================================================================
 # 几何图形工具 (Geometric Shapes)
 # =============================================================================
 
-def create_circle(radius: float = 1, color: str = BLUE, stroke_width: int = 4, **kwargs) -> Circle:
+@helper("几何图形")
+def create_circle(radius: float = 1, color: str = _ManimDefault("BLUE"), stroke_width: int = 4, **kwargs) -> Circle:
     """创建圆形
 
     Args:
@@ -31,7 +202,8 @@ def create_circle(radius: float = 1, color: str = BLUE, stroke_width: int = 4, *
     return Circle(radius=radius, color=color, stroke_width=stroke_width, **kwargs)
 
 
-def create_square(side_length: float = 2, color: str = RED, stroke_width: int = 4, **kwargs) -> Square:
+@helper("几何图形")
+def create_square(side_length: float = 2, color: str = _ManimDefault("RED"), stroke_width: int = 4, **kwargs) -> Square:
     """创建正方形
 
     Args:
@@ -45,7 +217,8 @@ def create_square(side_length: float = 2, color: str = RED, stroke_width: int =
     return Square(side_length=side_length, color=color, stroke_width=stroke_width, **kwargs)
 
 
-def create_triangle(side_length: float = 2, color: str = GREEN, stroke_width: int = 4, **kwargs) -> Triangle:
+@helper("几何图形")
+def create_triangle(side_length: float = 2, color: str = _ManimDefault("GREEN"), stroke_width: int = 4, **kwargs) -> Triangle:
     """创建等边三角形
 
     Args:
@@ -59,7 +232,8 @@ def create_triangle(side_length: float = 2, color: str = GREEN, stroke_width: in
     return Triangle(color=color, stroke_width=stroke_width, **kwargs)
 
 
-def create_polygon(n_sides: int, radius: float = 1, color: str = YELLOW, stroke_width: int = 4, **kwargs) -> RegularPolygon:
+@helper("几何图形")
+def create_polygon(n_sides: int, radius: float = 1, color: str = _ManimDefault("YELLOW"), stroke_width: int = 4, **kwargs) -> RegularPolygon:
     """创建正多边形
 
     Args:
@@ -74,7 +248,8 @@ def create_polygon(n_sides: int, radius: float = 1, color: str = YELLOW, stroke_
     return RegularPolygon(n=n_sides, radius=radius, color=color, stroke_width=stroke_width, **kwargs)
 
 
-def create_arrow(start: np.ndarray = LEFT, end: np.ndarray = RIGHT, color: str = YELLOW, **kwargs) -> Arrow:
+@helper("几何图形")
+def create_arrow(start: np.ndarray = _ManimDefault("LEFT"), end: np.ndarray = _ManimDefault("RIGHT"), color: str = _ManimDefault("YELLOW"), **kwargs) -> Arrow:
     """创建箭头
 
     Args:
@@ -92,24 +267,101 @@ def create_arrow(start: np.ndarray = LEFT, end: np.ndarray = RIGHT, color: str =
 # 函数绘图工具 (Function Plotting)
 # =============================================================================
 
-def plot_function(func: callable, x_range: tuple = (-3, 3), color: str = BLUE, axes: Axes = None, **kwargs) -> VMobject:
+@helper("函数绘图")
+def is_vectorized(func: callable, x_range: tuple = (-3, 3)) -> bool:
+    """检测函数能否直接处理 NumPy 数组
+
+    用 x_range 内的几个采样点比较数组调用和逐点调用的结果，一致才认为可以向量化。
+    math.sin、含 if 判断等只支持标量的函数会抛异常或结果不一致，返回 False。
+
+    Args:
+        func: 函数，接受 x 返回 y
+        x_range: x 范围 (start, end)
+
+    Returns:
+        是否可以向量化采样
+    """
+    probe = np.linspace(x_range[0], x_range[1], 5)
+    try:
+        with np.errstate(all="ignore"):
+            values = func(probe)
+            expected = [func(float(x)) for x in probe]
+        return (
+            isinstance(values, np.ndarray)
+            and values.shape == probe.shape
+            and np.allclose(values, expected, equal_nan=True)
+        )
+    except Exception:
+        return False
+
+
+def _supports_vectorized_plot() -> bool:
+    """manim >= 0.18 的 ParametricFunction 支持 use_vectorized"""
+    return "use_vectorized" in inspect.signature(ParametricFunction.__init__).parameters
+
+
+def _plot_options(func: callable, x_range: tuple, vectorized: bool = None) -> dict:
+    """按函数能否向量化决定采样方式，返回传给 axes.plot 的额外参数
+
+    只用于 axes.plot: FunctionGraph 内部的 lambda t: np.array([t, function(t), 0])
+    不能整段向量化调用，不带坐标系时见 _sampled_graph。
+    """
+    if vectorized is None:
+        vectorized = is_vectorized(func, x_range)
+    if vectorized and _supports_vectorized_plot():
+        return {"use_vectorized": True}
+    return {}
+
+
+def _parametric_only_args() -> set:
+    """ParametricFunction 特有（VMobject 不接受）的参数，如 discontinuities、dt"""
+    parametric = inspect.signature(ParametricFunction.__init__).parameters
+    return set(parametric) - set(inspect.signature(VMobject.__init__).parameters)
+
+
+def _sampled_graph(func: callable, x_range: tuple, **kwargs) -> VMobject:
+    """对整个 x_range 调用一次 func，用平滑曲线连接采样点"""
+    start, end = x_range[0], x_range[1]
+    step = x_range[2] if len(x_range) > 2 else FUNCTION_GRAPH_STEP
+    x = np.linspace(start, end, max(int(np.ceil((end - start) / step)), 1) + 1)
+    points = np.column_stack([x, func(x), np.zeros_like(x)])
+    return VMobject(**kwargs).set_points_smoothly(points)
+
+
+@helper("函数绘图")
+def plot_function(func: callable, x_range: tuple = (-3, 3), color: str = _ManimDefault("BLUE"), axes: Axes = None, vectorized: bool = None, **kwargs) -> VMobject:
     """绘制任意函数图像
 
+    函数能处理 NumPy 数组时（如 lambda x: x**2、np.sin）一次调用采样整个 x_range，
+    避免逐点调用 Python 函数的开销；只支持标量的函数自动回退到逐点采样。
+
     Args:
         func: 函数，接受 x 返回 y
         x_range: x 范围 (start, end)
         color: 颜色
         axes: 坐标系对象，可选
+        vectorized: 是否向量化采样，默认自动检测
 
     Returns:
         函数图像的 VMobject
     """
-    if axes:
-        return axes.plot(func, x_range=x_range, color=color, **kwargs)
-    return FunctionGraph(func, x_range=x_range, color=color, **kwargs)
-
-
-def plot_sine(x_range: tuple = (-PI, PI), amplitude: float = 1, color: str = BLUE, axes: Axes = None, **kwargs) -> VMobject:
+    def build():
+        use_vectorized = is_vectorized(func, x_range) if vectorized is None else vectorized
+        if axes:
+            options = {**_plot_options(func, x_range, use_vectorized), **kwargs}
+            return axes.plot(func, x_range=x_range, color=color, **options)
+        if use_vectorized and not kwargs.keys() & _parametric_only_args():
+            return _sampled_graph(func, x_range, color=color, **kwargs)
+        return FunctionGraph(func, x_range=x_range, color=color, **kwargs)
+
+    # 颜色不影响几何形状，不计入缓存键，命中后重新着色
+    key = _geometry_key("plot", func, x_range, axes, vectorized=vectorized, **kwargs)
+    graph, hit = _cached_geometry(key, build)
+    return graph.set_color(color) if hit else graph
+
+
+@helper("函数绘图")
+def plot_sine(x_range: tuple = _ManimDefault("(-PI, PI)"), amplitude: float = 1, color: str = _ManimDefault("BLUE"), axes: Axes = None, **kwargs) -> VMobject:
     """绘制正弦函数图像
 
     Args:
@@ -125,7 +377,8 @@ def plot_sine(x_range: tuple = (-PI, PI), amplitude: float = 1, color: str = BLU
     return plot_function(func, x_range=x_range, color=color, axes=axes, **kwargs)
 
 
-def plot_cosine(x_range: tuple = (-PI, PI), amplitude: float = 1, color: str = RED, axes: Axes = None, **kwargs) -> VMobject:
+@helper("函数绘图")
+def plot_cosine(x_range: tuple = _ManimDefault("(-PI, PI)"), amplitude: float = 1, color: str = _ManimDefault("RED"), axes: Axes = None, **kwargs) -> VMobject:
     """绘制余弦函数图像
 
     Args:
@@ -141,24 +394,31 @@ def plot_cosine(x_range: tuple = (-PI, PI), amplitude: float = 1, color: str = R
     return plot_function(func, x_range=x_range, color=color, axes=axes, **kwargs)
 
 
-def plot_derivative(func: callable, x_range: tuple = (-3, 3), delta: float = 0.001, color: str = YELLOW, axes: Axes = None, **kwargs) -> VMobject:
+@helper("函数绘图")
+def plot_derivative(func: callable, x_range: tuple = (-3, 3), delta: float = 0.001, color: str = _ManimDefault("YELLOW"), axes: Axes = None, vectorized: bool = None, **kwargs) -> VMobject:
     """绘制函数的导数图像
 
+    中心差分对数组同样成立，原函数可以向量化时导数整段一次计算。
+
     Args:
         func: 原函数
         x_range: x 范围
         delta: 数值求导步长
         color: 颜色
         axes: 坐标系
+        vectorized: 是否向量化采样，默认按原函数自动检测
 
     Returns:
         导数图像
     """
+    if vectorized is None:
+        vectorized = is_vectorized(func, x_range)
     deriv = lambda x: (func(x + delta) - func(x - delta)) / (2 * delta)
-    return plot_function(deriv, x_range=x_range, color=color, axes=axes, **kwargs)
+    return plot_function(deriv, x_range=x_range, color=color, axes=axes, vectorized=vectorized, **kwargs)
 
 
-def plot_integral(func: callable, x_range: tuple = (0, 2), color: str = BLUE, opacity: float = 0.3, axes: Axes = None, **kwargs) -> VGroup:
+@helper("函数绘图")
+def plot_integral(func: callable, x_range: tuple = (0, 2), color: str = _ManimDefault("BLUE"), opacity: float = 0.3, axes: Axes = None, **kwargs) -> VGroup:
     """绘制函数的积分面积
 
     Args:
@@ -171,21 +431,27 @@ def plot_integral(func: callable, x_range: tuple = (0, 2), color: str = BLUE, op
     Returns:
         包含函数图像和面积的 VGroup
     """
-    if axes:
-        graph = axes.plot(func, x_range=x_range, color=color)
-        area = axes.get_area(graph, x_range=x_range, color=color, opacity=opacity)
-        return VGroup(graph, area)
-    else:
-        axes_obj = Axes(x_range=[x_range[0]-1, x_range[1]+1], y_range=[0, 5])
-        graph = axes_obj.plot(func, x_range=x_range, color=color)
-        area = axes_obj.get_area(graph, x_range=x_range, color=color, opacity=opacity)
-        return VGroup(axes_obj, graph, area)
+    def build():
+        options = _plot_options(func, x_range)
+        if axes:
+            graph = axes.plot(func, x_range=x_range, color=color, **options)
+            area = axes.get_area(graph, x_range=x_range, color=color, opacity=opacity)
+            return VGroup(graph, area)
+        else:
+            axes_obj = Axes(x_range=[x_range[0]-1, x_range[1]+1], y_range=[0, 5])
+            graph = axes_obj.plot(func, x_range=x_range, color=color, **options)
+            area = axes_obj.get_area(graph, x_range=x_range, color=color, opacity=opacity)
+            return VGroup(axes_obj, graph, area)
+
+    key = _geometry_key("integral", func, x_range, axes, color=color, opacity=opacity)
+    return _cached_geometry(key, build)[0]
 
 
 # =============================================================================
 # 动画效果工具 (Animations)
 # =============================================================================
 
+@helper("动画效果")
 def fade_in_transform(mobject: Mobject, run_time: float = 1, lag_ratio: float = 0, **kwargs) -> Animation:
     """淡入动画
 
@@ -200,6 +466,7 @@ def fade_in_transform(mobject: Mobject, run_time: float = 1, lag_ratio: float =
     return FadeIn(mobject, run_time=run_time, lag_ratio=lag_ratio, **kwargs)
 
 
+@helper("动画效果")
 def grow_from_center(mobject: Mobject, run_time: float = 1, **kwargs) -> Animation:
     """从中心生长动画
 
@@ -213,6 +480,7 @@ def grow_from_center(mobject: Mobject, run_time: float = 1, **kwargs) -> Animati
     return GrowFromCenter(mobject, run_time=run_time, **kwargs)
 
 
+@helper("动画效果")
 def morph_transform(mobject1: Mobject, mobject2: Mobject, run_time: float = 2, **kwargs) -> Animation:
     """变形动画，将一个对象变成另一个
 
@@ -227,7 +495,8 @@ def morph_transform(mobject1: Mobject, mobject2: Mobject, run_time: float = 2, *
     return Transform(mobject1, mobject2, run_time=run_time, **kwargs)
 
 
-def rotate_and_scale(mobject: Mobject, angle: float = PI, scale_factor: float = 1.5, run_time: float = 1, **kwargs) -> Animation:
+@helper("动画效果")
+def rotate_and_scale(mobject: Mobject, angle: float = _ManimDefault("PI"), scale_factor: float = 1.5, run_time: float = 1, **kwargs) -> Animation:
     """旋转和缩放组合动画
 
     Args:
@@ -237,20 +506,17 @@ def rotate_and_scale(mobject: Mobject, angle: float = PI, scale_factor: float =
         run_time: 动画时长
 
     Returns:
-        动画组
+        旋转并缩放的 Transform 动画（与 Rotate 一样沿 path_arc 弧线运动，大角度旋转不会塌缩）
     """
-    return AnimationGroup(
-        Rotate(mobject, angle=angle, run_time=run_time),
-        Scale(mobject, scale_factor=scale_factor, run_time=run_time),
-        **kwargs
-    )
+    return mobject.animate(run_time=run_time, path_arc=angle, **kwargs).rotate(angle).scale(scale_factor).build()
 
 
 # =============================================================================
 # 文本公式工具 (Text & Formulas)
 # =============================================================================
 
-def create_formula(formula: str, font_size: float = 48, color: str = WHITE, **kwargs) -> MathTex:
+@helper("文本公式")
+def create_formula(formula: str, font_size: float = 48, color: str = _ManimDefault("WHITE"), **kwargs) -> MathTex:
     """创建数学公式
 
     Args:
@@ -268,7 +534,8 @@ def create_formula(formula: str, font_size: float = 48, color: str = WHITE, **kw
     return MathTex(formula, font_size=font_size, color=color, **kwargs)
 
 
-def create_title(text: str, font_size: float = 72, color: str = WHITE, **kwargs) -> Text:
+@helper("文本公式")
+def create_title(text: str, font_size: float = 72, color: str = _ManimDefault("WHITE"), **kwargs) -> Text:
     """创建标题文本
 
     Args:
@@ -282,25 +549,358 @@ def create_title(text: str, font_size: float = 72, color: str = WHITE, **kwargs)
     return Text(text, font_size=font_size, color=color, **kwargs)
 
 
-def create_bullet_points(items: list, font_size: float = 36, color: str = WHITE, buff: float = 0.5, **kwargs) -> VGroup:
+@helper("文本公式")
+def create_bullet_points(items: list, font_size: float = 36, color: str = _ManimDefault("WHITE"), buff: float = 0.5, batch: bool = False, **kwargs) -> VGroup:
     """创建项目符号列表
 
+    默认每项一个 Text 对象。batch=True 时所有列表项通过一个 Paragraph 一次完成 Pango 排版，
+    比逐项创建 Text 快得多，但每项是 Paragraph 的一行（VGroup，没有 .text 属性）；
+    列表项本身含换行时逐项排版。
+
     Args:
         items: 文本列表
         font_size: 字体大小
         color: 颜色
         buff: 项之间的间距
+        batch: 是否一次排版所有列表项
 
     Returns:
-        包含所有列表项的 VGroup
+        包含所有列表项的 VGroup；默认每项是 Text，batch=True 时每项是一行的 VGroup
 
     Example:
         bullets = create_bullet_points(["第一点", "第二点", "第三点"])
         self.play(Write(bullets))
     """
-    bullets = VGroup()
-    for item in items:
-        bullet = Text(f"• {item}", font_size=font_size, color=color, **kwargs)
-        bullets.add(bullet)
+    lines = [f"• {item}" for item in items]
+    if batch and len(lines) > 1 and not any("\n" in line for line in lines):
+        paragraph = Paragraph(*lines, font_size=font_size, color=color, **kwargs)
+        bullets = VGroup(*paragraph.submobjects)
+    else:
+        bullets = VGroup(*(Text(line, font_size=font_size, color=color, **kwargs) for line in lines))
     bullets.arrange(DOWN, aligned_edge=LEFT, buff=buff)
     return bullets
+
+
+# =============================================================================
+# 几何缓存 (Geometry Cache)
+# =============================================================================
+
+@helper("几何缓存")
+def enable_geometry_cache(max_bytes: int = GEOMETRY_CACHE_MAX_BYTES):
+    """开启几何缓存: 相同函数、范围、坐标系和采样参数的图像只计算一次
+
+    命中时返回缓存图像的副本（点数组是复制出来的，修改不影响缓存），
+    超过 max_bytes 时按最近使用顺序（LRU）淘汰。适合多个场景或变体反复绘制同样曲线的情况。
+
+    Args:
+        max_bytes: 缓存图像点数组的总大小上限（字节）
+
+    Example:
+        enable_geometry_cache()
+        for color in (BLUE, RED, GREEN):
+            self.add(plot_sine(color=color))
+    """
+    _GEOMETRY_CACHE["enabled"] = True
+    _GEOMETRY_CACHE["max_bytes"] = max_bytes
+    _evict_geometry_cache()
+
+
+@helper("几何缓存")
+def disable_geometry_cache():
+    """关闭几何缓存并清空"""
+    _GEOMETRY_CACHE.update(enabled=False, bytes=0)
+    _GEOMETRY_CACHE["entries"].clear()
+
+
+@helper("几何缓存")
+def geometry_cache_info() -> dict:
+    """几何缓存统计
+
+    Returns:
+        dict: enabled、entries、bytes、max_bytes、hits、misses
+    """
+    return {
+        "enabled": _GEOMETRY_CACHE["enabled"],
+        "entries": len(_GEOMETRY_CACHE["entries"]),
+        "bytes": _GEOMETRY_CACHE["bytes"],
+        "max_bytes": _GEOMETRY_CACHE["max_bytes"],
+        "hits": _GEOMETRY_CACHE["hits"],
+        "misses": _GEOMETRY_CACHE["misses"]
+    }
+
+
+def _value_key(value, _seen: frozenset = frozenset()):
+    """把闭包变量、全局变量等转换为可哈希的缓存键，无法可靠比较的对象抛出 TypeError"""
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        return value
+    if isinstance(value, (tuple, list)):
+        return tuple(_value_key(v, _seen) for v in value)
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.shape, value.dtype.str, value.tobytes())
+    if isinstance(value, np.generic):
+        return value.item()
+    if callable(value):
+        return _function_key(value, _seen)
+    if inspect.ismodule(value):
+        return ("module", value.__name__)
+    raise TypeError(f"无法作为缓存键: {type(value).__name__}")
+
+
+def _function_key(func: callable, _seen: frozenset = frozenset()):
+    """
+    函数身份: 字节码、常量、闭包变量和引用的全局变量的值（lambda 每次重新创建也能命中）
+
+    _seen 记录正在计算键的函数，递归或互相引用的函数再次出现时只用名字表示。
+    """
+    code = getattr(func, "__code__", None)
+    if code is None:
+        # np.sin 等 ufunc 和内置函数按类型和名字区分
+        return (type(func).__qualname__, getattr(func, "__module__", None), func.__name__)
+    if id(func) in _seen:
+        return ("recursive", func.__qualname__)
+
+    _seen = _seen | {id(func)}
+    consts = tuple(c.co_code if inspect.iscode(c) else c for c in code.co_consts)
+    # 空的闭包单元（变量尚未赋值）访问 cell_contents 会抛出 ValueError，由 _geometry_key 处理
+    closure = tuple(_value_key(cell.cell_contents, _seen) for cell in func.__closure__ or ())
+    referenced = tuple(
+        (name, _value_key(func.__globals__[name], _seen))
+        for name in code.co_names if name in func.__globals__
+    )
+    # 绑定方法的属性代理到底层函数，结果还取决于实例状态；普通实例无法比较，会抛出 TypeError 不缓存
+    bound = _value_key(func.__self__, _seen) if inspect.ismethod(func) else None
+    return (code.co_code, consts, closure, referenced, _value_key(func.__defaults__, _seen), bound)
+
+
+def _axes_key(axes: Axes):
+    """坐标系的范围、类型和当前位置（原点和单位点的屏幕坐标）"""
+    if axes is None:
+        return None
+    return (
+        type(axes).__name__,
+        _value_key(list(axes.x_range)),
+        _value_key(list(axes.y_range)),
+        type(axes.x_axis.scaling).__name__,
+        tuple(np.round(axes.c2p(0, 0), 6)),
+        tuple(np.round(axes.c2p(1, 1), 6))
+    )
+
+
+def _geometry_key(kind: str, func: callable, x_range: tuple, axes: Axes, **params):
+    """几何缓存键，缓存关闭或参数无法可靠比较时返回 None"""
+    if not _GEOMETRY_CACHE["enabled"]:
+        return None
+    try:
+        return (
+            kind,
+            _function_key(func),
+            _value_key(list(x_range)),
+            _axes_key(axes),
+            tuple(sorted((name, _value_key(value)) for name, value in params.items()))
+        )
+    except (TypeError, AttributeError, ValueError, RecursionError):
+        return None
+
+
+def _cached_geometry(key, build: callable) -> tuple:
+    """
+    按键查询几何缓存，未命中时调用 build 构建并缓存
+
+    Returns:
+        (mobject, hit): 命中时返回缓存对象的副本
+    """
+    if key is None:
+        return build(), False
+
+    entries = _GEOMETRY_CACHE["entries"]
+    if key in entries:
+        entries.move_to_end(key)
+        _GEOMETRY_CACHE["hits"] += 1
+        return entries[key][0].copy(), True
+
+    _GEOMETRY_CACHE["misses"] += 1
+    mobject = build()
+    nbytes = sum(m.points.nbytes for m in mobject.get_family())
+    entries[key] = (mobject.copy(), nbytes)
+    _GEOMETRY_CACHE["bytes"] += nbytes
+    _evict_geometry_cache()
+    return mobject, False
+
+
+def _evict_geometry_cache():
+    entries = _GEOMETRY_CACHE["entries"]
+    while entries and _GEOMETRY_CACHE["bytes"] > _GEOMETRY_CACHE["max_bytes"]:
+        _, (_, nbytes) = entries.popitem(last=False)
+        _GEOMETRY_CACHE["bytes"] -= nbytes
+
+
+# =============================================================================
+# 公式与文字缓存 (Tex & Text Cache)
+# =============================================================================
+
+@helper("公式与文字缓存")
+def enable_tex_cache(cache_dir: str = None) -> Path:
+    """把 manim 的 tex_dir 指向共享的持久缓存目录
+
+    Args:
+        cache_dir: 缓存目录，默认 TEX_CACHE_DIR
+
+    Returns:
+        缓存目录路径
+    """
+    cache_dir = Path(cache_dir or TEX_CACHE_DIR).expanduser().resolve()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    config.tex_dir = str(cache_dir)
+    return cache_dir
+
+
+@helper("公式与文字缓存")
+def enable_text_cache(cache_dir: str = None) -> Path:
+    """把 manim 的 text_dir 指向共享的持久缓存目录，Text 的字形轮廓跨场景、跨运行复用
+
+    Args:
+        cache_dir: 缓存目录，默认 TEXT_CACHE_DIR
+
+    Returns:
+        缓存目录路径
+    """
+    cache_dir = Path(cache_dir or TEXT_CACHE_DIR).expanduser().resolve()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    config.text_dir = str(cache_dir)
+    return cache_dir
+
+
+@helper("公式与文字缓存")
+def collect_formulas(source: str) -> list:
+    """从场景源码中收集 create_formula / MathTex 的字面量公式
+
+    只收集第一个参数是字符串字面量且只有一个位置参数的调用，
+    动态拼接的公式在 construct 中照常编译。
+
+    Args:
+        source: 场景源码
+
+    Returns:
+        去重后的公式列表
+    """
+    formulas = []
+    for node in ast.walk(ast.parse(source)):
+        if not isinstance(node, ast.Call) or len(node.args) != 1:
+            continue
+        name = node.func.id if isinstance(node.func, ast.Name) else getattr(node.func, "attr", None)
+        arg = node.args[0]
+        if name in ("create_formula", "MathTex") and isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            formulas.append(arg.value)
+    return list(dict.fromkeys(formulas))
+
+
+def _init_formula_worker(tex_dir: str):
+    """公式编译进程: 导入 manim，写入与主进程相同的 tex_dir"""
+    _load_manim()
+    config.tex_dir = tex_dir
+
+
+def _compile_formula(formula: str, options: dict) -> bool:
+    """创建一次 MathTex，生成的 SVG 留在 tex_dir 中；失败返回 False"""
+    try:
+        MathTex(formula, **options)
+        return True
+    except Exception:
+        return False
+
+
+@helper("公式与文字缓存")
+def prefetch_formulas(formulas: list, max_workers: int = None, **kwargs) -> dict:
+    """并行预编译公式，结果写入共享缓存
+
+    manim 写 .tex / .dvi 和解析 SVG 都不是线程安全的，所以用进程池，每个进程写入同一个 tex_dir；
+    公式先去重，不同进程不会编译同一个文件。已在缓存中的公式只需读取 SVG。
+    编译失败的公式只计数，错误会在 construct 中真正创建时照常抛出。
+
+    Args:
+        formulas: LaTeX 公式字符串列表
+        max_workers: 最大并发数，默认 CPU 核数（最多 8）
+        **kwargs: 传给 MathTex 的参数（如 tex_template）
+
+    Returns:
+        本次统计: formulas、hits、misses、failed、compile_seconds
+    """
+    formulas = list(dict.fromkeys(formulas))
+    tex_dir = Path(config.tex_dir)
+    before = set(tex_dir.glob("*.svg")) if tex_dir.exists() else set()
+    started = time.time()
+
+    compile_formula = functools.partial(_compile_formula, options=kwargs)
+    workers = min(max_workers or min(8, os.cpu_count() or 1), len(formulas))
+    if workers <= 1:
+        results = [compile_formula(formula) for formula in formulas]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_formula_worker, initargs=(str(tex_dir),)
+        ) as pool:
+            results = list(pool.map(compile_formula, formulas))
+
+    failed = results.count(False)
+    misses = len(set(tex_dir.glob("*.svg")) - before)
+    stats = {
+        "formulas": len(formulas),
+        "hits": max(len(formulas) - misses - failed, 0),
+        "misses": misses,
+        "failed": failed,
+        "compile_seconds": round(time.time() - started, 3)
+    }
+    for key, value in stats.items():
+        TEX_CACHE_STATS[key] += value
+    return stats
+
+
+@helper("公式与文字缓存")
+def prefetch_scene_formulas(scene: Scene, max_workers: int = None) -> dict:
+    """在 construct 之前预编译场景源码中的全部公式，并输出命中率和编译耗时
+
+    Args:
+        scene: 场景对象（通常在 setup 中传入 self）
+        max_workers: 最大并发数
+
+    Returns:
+        本次统计，同 prefetch_formulas
+
+    Example:
+        class Lecture(Scene):
+            def setup(self):
+                prefetch_scene_formulas(self)
+    """
+    source_file = inspect.getsourcefile(type(scene))
+    formulas = collect_formulas(Path(source_file).read_text(encoding="utf-8"))
+    if not formulas:
+        return {"formulas": 0, "hits": 0, "misses": 0, "failed": 0, "compile_seconds": 0.0}
+
+    stats = prefetch_formulas(formulas, max_workers=max_workers)
+    hit_rate = stats["hits"] / stats["formulas"]
+    print(
+        f"📐 公式预编译: {stats['formulas']} 个，命中缓存 {stats['hits']} ({hit_rate:.0%})，"
+        f"编译 {stats['misses']} 个，耗时 {stats['compile_seconds']:.2f}s"
+    )
+    return stats
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列出 Manim Tools 工具函数（不导入 manim）")
+    parser.add_argument("--list", nargs="?", const="", metavar="KEYWORD", help="列出工具函数，可按关键字过滤")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args()
+
+    helpers = list_helpers(args.list)
+    if args.json:
+        print(json.dumps(helpers, indent=2, ensure_ascii=False))
+        return
+
+    for record in helpers:
+        summary = (record["doc"] or "").splitlines()[0] if record["doc"] else ""
+        print(f"[{record['category']}] {record['signature']}")
+        print(f"    {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,122 +5,75 @@
 从配置文件和命令文件中提取元数据，生成 Markdown 表格
 """
 
-import json
+import os
 import re
+import sys
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
+BASE_PATH = Path(__file__).parent.parent
 
-def extract_frontmatter(file_path: Path) -> Dict:
-    """从 Markdown 文件中提取 YAML frontmatter"""
-    content = file_path.read_text(encoding='utf-8')
+# 与 CI 验证脚本共用仓库扫描器
+sys.path.insert(0, str(BASE_PATH / '.github' / 'scripts'))
+from frontmatter_parser import save_cache  # noqa: E402
+from repo_scanner import get_frontmatter, marketplace_plugins, scan_repository  # noqa: E402
 
-    match = re.match(r'^---\n(.*?)\n---', content, re.DOTALL)
-    if not match:
-        return {}
+# 自动生成的章节: 标题行之后、下一个标题之前的内容（第 2 组）会被替换
+README_SECTIONS = {
+    '插件表格': re.compile(r'(## 📦 已包含插件.*?\n)(.*?)(\n## 📋)', re.DOTALL),
+    '命令表格': re.compile(r'(## 📋 可用命令.*?\n)(.*?)(\n## 📖)', re.DOTALL),
+}
 
-    # 解析 YAML（支持简单格式和列表）
-    frontmatter = {}
-    lines = match.group(1).split('\n')
-    current_list = None
 
-    for line in lines:
-        # 处理列表项（以 - 开头）
-        if line.strip().startswith('- '):
-            if current_list is not None:
-                current_list.append(line.strip()[2:])
-            continue
-
-        # 如果之前在收集列表，现在结束了
-        if current_list is not None:
-            frontmatter[last_key] = current_list
-            current_list = None
-
-        if ':' in line:
-            key, value = line.split(':', 1)
-            key = key.strip()
-            value = value.strip()
-
-            # 处理内联数组 [a, b, c]
-            if value.startswith('[') and value.endswith(']'):
-                value = [v.strip() for v in value[1:-1].split(',')]
-                frontmatter[key] = value
-            # 处理空值（可能是多行列表的开始）
-            elif value == '' or value == '[]':
-                last_key = key
-                current_list = []
-            else:
-                frontmatter[key] = value
-
-    # 处理文件末尾的列表
-    if current_list is not None:
-        frontmatter[last_key] = current_list
-
-    return frontmatter
-
-
-def load_marketplace() -> List[Dict]:
+def load_marketplace(repo: Dict = None) -> List[Dict]:
     """加载 marketplace.json 中的插件信息"""
-    marketplace_path = Path(__file__).parent.parent / '.claude-plugin' / 'marketplace.json'
-
-    if not marketplace_path.exists():
-        return []
+    return marketplace_plugins(repo or scan_repository(BASE_PATH))
 
-    with open(marketplace_path, encoding='utf-8') as f:
-        data = json.load(f)
 
-    return data.get('plugins', [])
+def _as_text(value, default: str) -> str:
+    """frontmatter 值转换为字符串，空值使用默认值"""
+    return default if value is None or value == '' else str(value)
 
 
-def discover_commands() -> List[Dict]:
+def discover_commands(repo: Dict = None) -> List[Dict]:
     """扫描所有命令文件"""
-    base_path = Path(__file__).parent.parent
+    repo = repo or scan_repository(BASE_PATH)
     commands = []
 
-    # 扫描项目级命令 (.claude/commands/)
-    project_commands_path = base_path / '.claude' / 'commands'
-    if project_commands_path.exists():
-        for cmd_file in project_commands_path.glob('*.md'):
-            frontmatter = extract_frontmatter(cmd_file)
-            if frontmatter.get('name'):
-                commands.append({
-                    'name': f"/{frontmatter['name']}",
-                    'description': frontmatter.get('description', ''),
-                    'version': frontmatter.get('version', '-'),
-                    'tags': frontmatter.get('tags', []),
-                    'type': '项目命令',
-                    'location': f".claude/commands/{cmd_file.name}"
-                })
-
-    # 扫描插件级命令 (plugins/*/commands/)
-    plugins_path = base_path / 'plugins'
-    if plugins_path.exists():
-        for plugin_dir in plugins_path.iterdir():
-            commands_path = plugin_dir / 'commands'
-            if commands_path.exists():
-                for cmd_file in commands_path.glob('*.md'):
-                    frontmatter = extract_frontmatter(cmd_file)
-                    if frontmatter.get('name'):
-                        commands.append({
-                            'name': f"/{frontmatter['name']}",
-                            'description': frontmatter.get('description', ''),
-                            'version': frontmatter.get('version', '-'),
-                            'tags': frontmatter.get('tags', []),
-                            'type': f'插件 ({plugin_dir.name})',
-                            'location': f"plugins/{plugin_dir.name}/commands/{cmd_file.name}"
-                        })
+    # 项目级命令 (.claude/commands/) 和插件级命令 (plugins/*/commands/)
+    sources = [(cmd_file, '项目命令', f".claude/commands/{cmd_file.name}") for cmd_file in repo['project_commands']]
+    for plugin in repo['plugins'].values():
+        sources.extend(
+            (cmd_file, f"插件 ({plugin['name']})", f"plugins/{plugin['name']}/commands/{cmd_file.name}")
+            for cmd_file in plugin['files']['command']
+        )
+
+    for cmd_file, cmd_type, location in sources:
+        frontmatter = get_frontmatter(repo, cmd_file)
+        if frontmatter.get('name'):
+            # YAML 值可能是数字、None 或单个字符串，表格需要的字段统一转换为字符串
+            tags = frontmatter.get('tags') or []
+            if not isinstance(tags, list):
+                tags = [tags]
+            commands.append({
+                'name': f"/{frontmatter['name']}",
+                'description': _as_text(frontmatter.get('description'), ''),
+                'version': _as_text(frontmatter.get('version'), '-'),
+                'tags': [_as_text(tag, '') for tag in tags],
+                'type': cmd_type,
+                'location': location
+            })
 
     return commands
 
 
-def generate_plugins_table(plugins: List[Dict]) -> str:
+def generate_plugins_table(plugins: List[Dict], repo: Dict = None) -> str:
     """生成插件表格 Markdown"""
     if not plugins:
         return "| 暂无插件 |\n|----------|"
 
     # 从 marketplace 获取详细信息
-    marketplace_plugins = load_marketplace()
-    plugin_info = {p['name']: p for p in marketplace_plugins}
+    plugin_info = {p['name']: p for p in load_marketplace(repo)}
 
     lines = [
         "| 插件名称 | 版本 | 类别 | 描述 |",
@@ -162,9 +115,44 @@ def generate_commands_table(commands: List[Dict]) -> str:
     return '\n'.join(lines)
 
 
+def replace_sections(content: str, tables: Dict[str, str]) -> Tuple[str, List[str]]:
+    """
+    在内存中替换 README 的表格章节（标题行与下一个标题之间的内容）
+
+    Args:
+        content: README 原内容
+        tables: {章节名: 表格 Markdown}，章节名见 README_SECTIONS
+
+    Returns:
+        (新内容, 内容有变化的章节名列表)
+    """
+    replacements = []
+    for name, table in tables.items():
+        match = README_SECTIONS[name].search(content)
+        if not match:
+            print(f"⚠️  README.md 中未找到{name}章节，跳过")
+            continue
+        body = f"{table}\n"
+        if match.group(2) != body:
+            replacements.append((match.start(2), match.end(2), body, name))
+
+    # 从后往前替换，前面章节的位置不受影响
+    for start, end, body, _ in sorted(replacements, reverse=True):
+        content = content[:start] + body + content[end:]
+
+    return content, [name for _, _, _, name in sorted(replacements)]
+
+
+def write_atomic(path: Path, content: str):
+    """先写临时文件再替换，中断时不会留下写了一半的文件"""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(content, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
 def update_readme():
     """更新 README.md 中的表格"""
-    readme_path = Path(__file__).parent.parent / 'README.md'
+    readme_path = BASE_PATH / 'README.md'
 
     if not readme_path.exists():
         print("❌ README.md 不存在")
@@ -172,33 +160,24 @@ def update_readme():
 
     content = readme_path.read_text(encoding='utf-8')
 
-    # 获取数据
-    plugins = load_marketplace()
-    commands = discover_commands()
-
-    # 生成表格
-    plugins_table = generate_plugins_table(plugins)
-    commands_table = generate_commands_table(commands)
-
-    # 替换插件表格（从标题到下一个标题之间）
-    content = re.sub(
-        r'(## 📦 已包含插件.*?\n)(.*?)(\n## 📋)',
-        rf'\1{plugins_table}\n\3',
-        content,
-        flags=re.DOTALL
-    )
-
-    # 替换命令表格（从标题到下一个标题之间）
-    content = re.sub(
-        r'(## 📋 可用命令.*?\n)(.*?)(\n## 📖)',
-        rf'\1{commands_table}\n\3',
-        content,
-        flags=re.DOTALL
-    )
-
-    readme_path.write_text(content, encoding='utf-8')
-
-    print(f"✅ README.md 已更新")
+    # 获取数据（只扫描一次仓库）
+    repo = scan_repository(BASE_PATH)
+    plugins = load_marketplace(repo)
+    commands = discover_commands(repo)
+    save_cache()
+
+    # 生成表格并在内存中替换
+    new_content, changed = replace_sections(content, {
+        '插件表格': generate_plugins_table(plugins, repo),
+        '命令表格': generate_commands_table(commands),
+    })
+
+    # 内容不变时不写文件，保持原 mtime，下游文档构建和缓存不失效
+    if changed:
+        write_atomic(readme_path, new_content)
+        print(f"✅ README.md 已更新: {', '.join(changed)}")
+    else:
+        print(f"✔️  README.md 无需更新")
     print(f"   - {len(plugins)} 个插件")
     print(f"   - {len(commands)} 个命令")
     return True
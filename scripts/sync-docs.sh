@@ -1,5 +1,6 @@
 #!/bin/bash
 # 同步插件 README 到 docs 目录（用于 GitHub Pages）
+# 只复制内容有变化的文件，未变的文件保持原 mtime，mkdocs 和 CI 缓存不失效
 
 set -e
 
@@ -7,12 +8,29 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_ROOT="$(dirname "$SCRIPT_DIR")"
 DOCS_DIR="$PROJECT_ROOT/docs"
 
+changed_files=()
+
+# 内容不同时才（原子地）复制
+sync_file() {
+  local src="$1"
+  local dest="$2"
+  local label="$3"
+
+  if cmp -s "$src" "$dest"; then
+    echo "  = ${label}（未变化）"
+  else
+    cp "$src" "$dest.tmp"
+    mv "$dest.tmp" "$dest"
+    changed_files+=("$dest")
+    echo "  ✓ ${label}"
+  fi
+}
+
 echo "🔄 同步文档到 docs 目录..."
 
 # 复制主 README
 if [ -f "$PROJECT_ROOT/README.md" ]; then
-  cp "$PROJECT_ROOT/README.md" "$DOCS_DIR/README.md"
-  echo "  ✓ README.md"
+  sync_file "$PROJECT_ROOT/README.md" "$DOCS_DIR/README.md" "README.md"
 fi
 
 # 复制插件 README
@@ -23,17 +41,16 @@ for plugin_dir in "$PROJECT_ROOT"/plugins/*/; do
     plugin_readme="$plugin_dir/README.md"
 
     if [ -f "$plugin_readme" ]; then
-      cp "$plugin_readme" "$DOCS_DIR/${plugin_name}.md"
-      echo "  ✓ ${plugin_name}.md"
+      sync_file "$plugin_readme" "$DOCS_DIR/${plugin_name}.md" "${plugin_name}.md"
       found_plugins=$((found_plugins + 1))
     fi
   fi
 done
 
-# 自动添加到 git（如果不在 git 仓库中跳过）
-if git rev-parse --git-dir > /dev/null 2>&1; then
-  git add docs/ 2>/dev/null || true
+# 只把有变化的文件添加到 git（如果不在 git 仓库中跳过）
+if [ ${#changed_files[@]} -gt 0 ] && git rev-parse --git-dir > /dev/null 2>&1; then
+  git add "${changed_files[@]}" 2>/dev/null || true
 fi
 
-echo "✅ docs 已同步 (主文档 + ${found_plugins} 个插件文档)"
+echo "✅ docs 已同步 (主文档 + ${found_plugins} 个插件文档，${#changed_files[@]} 个文件有变化)"
 exit 0